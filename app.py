@@ -1,8 +1,13 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context
 import subprocess
 import os
+import json
 from functools import wraps
 from appinsights import AppInsightsClient
+from loadrunner import LoadRunManager, moo_command, run_moo_command
+from ppfile import inspect_pp_file
+from ppgen import load_manifest
+from resultstore import ResultStore
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # For session management
@@ -11,6 +16,9 @@ app.secret_key = os.urandom(24)  # For session management
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "password"
 
+results_store = ResultStore(os.environ.get('RESULTS_DB', 'results.db'))
+load_runs = LoadRunManager(store=results_store)
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -45,7 +53,7 @@ def admin_logout():
 def moo_login():
     try:
         data = request.json
-        cmd = ['moo', 'login']
+        cmd = moo_command(['login'])
         
         # Add optional arguments based on the request
         if data.get('device_code'):
@@ -76,7 +84,7 @@ def moo_login():
 @login_required
 def moo_logout():
     try:
-        result = subprocess.run(['moo', 'logout'], capture_output=True, text=True)
+        result = subprocess.run(moo_command(['logout']), capture_output=True, text=True)
         
         if result.returncode == 0:
             return jsonify({'success': True, 'message': 'MOO logout successful', 'output': result.stdout})
@@ -89,37 +97,116 @@ def moo_logout():
 @login_required
 def execute_command():
     try:
-        import time
-        start_time = time.time()
-        
         data = request.json
-        cmd = ['moo'] + data.get('args', [])
-        
-        # Set timeout for subprocess
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        end_time = time.time()
-        server_time_ms = (end_time - start_time) * 1000
-        
-        return jsonify({
-            'success': result.returncode == 0,
-            'message': 'Command executed successfully' if result.returncode == 0 else 'Command failed',
-            'output': result.stdout,
-            'error': result.stderr,
-            'serverTiming': server_time_ms  # Add server-side timing
-        })
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            'success': False,
-            'message': 'Command timed out after 300 seconds',
-            'error': 'Timeout'
-        })
+        return jsonify(run_moo_command(data.get('args', [])))
     except Exception as e:
         return jsonify({
             'success': False,
             'message': str(e)
         })
 
+@app.route('/api/load-runs', methods=['POST'])
+@login_required
+def create_load_run():
+    data = request.get_json()
+    try:
+        rate = data.get('rate')
+        run = load_runs.create(
+            args=data.get('args'),
+            iterations=int(data.get('iterations', 10)),
+            concurrency=int(data.get('concurrency', 1)),
+            rate=float(rate) if rate else None,
+            delay_ms=int(data.get('delayMs', 0)),
+            sweep=data.get('sweep'),
+            client_version=data.get('clientVersion'),
+            verify_pp=bool(data.get('verifyPp'))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid load run: {str(e)}'
+        }), 400
+
+    return jsonify({'success': True, 'runId': run.id, 'run': run.to_dict()}), 202
+
+@app.route('/api/load-runs', methods=['GET'])
+@login_required
+def list_load_runs():
+    return jsonify({'success': True, 'runs': [run.to_dict() for run in load_runs.list()]})
+
+@app.route('/api/load-runs/<run_id>', methods=['GET'])
+@login_required
+def get_load_run(run_id):
+    run = load_runs.get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': 'Load run not found'}), 404
+    since = request.args.get('since', 0, type=int)
+    return jsonify({'success': True, 'run': run.to_dict(since=since)})
+
+@app.route('/api/load-runs/<run_id>/throughput', methods=['GET'])
+@login_required
+def get_load_run_throughput(run_id):
+    run = load_runs.get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': 'Load run not found'}), 404
+    return jsonify({'success': True, 'throughput': run.throughput()})
+
+@app.route('/api/load-runs/<run_id>/histogram', methods=['GET'])
+@login_required
+def get_load_run_histogram(run_id):
+    run = load_runs.get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': 'Load run not found'}), 404
+    return jsonify({'success': True, 'histogram': run.histogram.to_dict()})
+
+@app.route('/api/histograms/<command>', methods=['GET'])
+@login_required
+def get_command_histogram(command):
+    return jsonify({'success': True, 'histogram': load_runs.command_histogram(command).to_dict()})
+
+@app.route('/api/load-runs/<run_id>/events', methods=['GET'])
+@login_required
+def stream_load_run(run_id):
+    run = load_runs.get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': 'Load run not found'}), 404
+
+    # EventSource sends Last-Event-ID when it reconnects after a dropped stream
+    after = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', 0, type=int)
+
+    def generate():
+        last_event_id = after
+        # Output is live only: a reconnecting client resumes results, not the output it missed
+        last_output_id = run.last_output_id if after else 0
+        while True:
+            events, outputs = run.wait_for_events(last_event_id, last_output_id, timeout=15)
+            if not events and not outputs:
+                if run.finished:
+                    return
+                yield ': keepalive\n\n'
+                continue
+            for output in outputs:
+                last_output_id = output['id']
+                # No `id:` line, so Last-Event-ID keeps tracking results only
+                yield f"event: output\ndata: {json.dumps(output['data'])}\n\n"
+            for event in events:
+                last_event_id = event['id']
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                if event['event'] == 'end':
+                    return
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                     headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/load-runs/<run_id>/cancel', methods=['POST'])
+@login_required
+def cancel_load_run(run_id):
+    run = load_runs.get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': 'Load run not found'}), 404
+    run.cancel()
+    return jsonify({'success': True, 'run': run.to_dict()})
+
 @app.route('/api/search-appinsights', methods=['POST'])
 @login_required
 def search_appinsights():
@@ -145,5 +232,112 @@ def search_appinsights():
             'message': f'Error: {str(e)}'
         }), 500
 
+@app.route('/api/history', methods=['GET'])
+@login_required
+def get_history():
+    iterations = results_store.history(
+        command=request.args.get('command'),
+        run_id=request.args.get('runId'),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        limit=request.args.get('limit', 100, type=int)
+    )
+    return jsonify({'success': True, 'iterations': iterations})
+
+@app.route('/api/history/runs', methods=['GET'])
+@login_required
+def get_history_runs():
+    runs = results_store.runs(
+        command=request.args.get('command'),
+        limit=request.args.get('limit', 100, type=int)
+    )
+    return jsonify({'success': True, 'runs': runs})
+
+@app.route('/api/compare', methods=['GET'])
+@login_required
+def compare_runs():
+    baseline_run = request.args.get('baselineRun')
+    candidate_run = request.args.get('candidateRun')
+    command = request.args.get('command')
+    baseline_version = request.args.get('baselineVersion')
+    candidate_version = request.args.get('candidateVersion')
+
+    if baseline_run and candidate_run:
+        baseline = results_store.aggregate(run_id=baseline_run)
+        candidate = results_store.aggregate(run_id=candidate_run)
+    elif command and baseline_version and candidate_version:
+        baseline = results_store.aggregate(client_version=baseline_version, command=command)
+        candidate = results_store.aggregate(client_version=candidate_version, command=command)
+    else:
+        return jsonify({
+            'success': False,
+            'message': 'Provide baselineRun and candidateRun, or command, baselineVersion and candidateVersion'
+        }), 400
+
+    comparison = results_store.compare(baseline, candidate)
+    if comparison['test'] is None:
+        return jsonify({
+            'success': False,
+            'message': 'At least two successful iterations are needed on each side',
+            'comparison': comparison
+        })
+    return jsonify({'success': True, 'comparison': comparison})
+
+@app.route('/api/pp-info', methods=['GET'])
+@login_required
+def pp_info():
+    path = request.args.get('path')
+    if not path:
+        return jsonify({'success': False, 'message': 'path is required'}), 400
+    if not os.path.isfile(path):
+        return jsonify({'success': False, 'message': f'File not found: {path}'}), 404
+
+    checksums = request.args.get('checksums', 'true').lower() != 'false'
+    try:
+        info = inspect_pp_file(path, checksums=checksums)
+    except (OSError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Could not read PP file: {str(e)}'}), 500
+    return jsonify({'success': True, 'info': info})
+
+@app.route('/api/pp-ladder', methods=['GET'])
+@login_required
+def pp_ladder():
+    manifest_path = os.environ.get('PP_LADDER_MANIFEST', os.path.join('pp-ladder', 'manifest.json'))
+    if not os.path.isfile(manifest_path):
+        return jsonify({
+            'success': False,
+            'message': f'No benchmark ladder at {manifest_path}; create one with `python ppgen.py ladder`'
+        }), 404
+    try:
+        manifest = load_manifest(manifest_path)
+    except (OSError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Could not read benchmark ladder: {str(e)}'}), 500
+    return jsonify({'success': True, 'manifest': manifest})
+
+@app.route('/api/search-appinsights/batch', methods=['POST'])
+@login_required
+def search_appinsights_batch():
+    data = request.get_json()
+    api_key = data.get('apiKey')
+    app_id = data.get('appId')
+    command_ids = data.get('commandIds')
+    time_range = data.get('timeRange', '24h')
+
+    if not api_key or not app_id or not isinstance(command_ids, list) or not command_ids:
+        return jsonify({
+            'success': False,
+            'message': 'API Key, Application ID, and a list of Command IDs are required'
+        }), 400
+
+    try:
+        client = AppInsightsClient(api_key, app_id)
+        results = client.search_commands(command_ids, time_range)
+        return jsonify({'success': True, 'results': results})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
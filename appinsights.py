@@ -1,12 +1,157 @@
 import requests
-from datetime import datetime, timedelta
-import json
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import re
+import threading
+import time
+
+DEFAULT_BASE_URL = "https://api.applicationinsights.io/v1/apps"
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+MAX_PARALLEL_QUERIES = 8
+BATCH_SIZE = 50
+CACHE_TTL_SECONDS = 600
+CACHE_MAX_ENTRIES = 4096
+# Traces can take minutes to be ingested; a timeline this old is not going to grow
+INGESTION_WINDOW_SECONDS = 300
+TERMINAL_MESSAGE = re.compile(r'^Command (completed|failed|cancelled|aborted)', re.IGNORECASE)
+
+
+def _create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_PARALLEL_QUERIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every client so connections (and TLS sessions) are reused across requests
+_session = _create_session()
+_cache = TTLCache()
+
+
+def _kql_string(value):
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _build_result(rows):
+    if not rows:
+        return {
+            "success": False,
+            "message": "No command data found for the specified ID",
+            "commandDetails": None,
+            "timeline": None
+        }
+
+    # Extract command details and timeline
+    command_details = {
+        "start_time": rows[0][0],
+        "end_time": rows[-1][0],
+        "total_events": len(rows),
+        "severity_levels": list(set(row[2] for row in rows)),
+        "custom_dimensions": rows[0][3] if rows[0][3] else {}
+    }
+
+    timeline = [
+        {
+            "timestamp": row[0],
+            "message": row[1],
+            "severity": row[2],
+            "details": row[3]
+        }
+        for row in rows
+    ]
+
+    return {
+        "success": True,
+        "message": "Command data retrieved successfully",
+        "commandDetails": command_details,
+        "timeline": timeline
+    }
+
+
+def _parse_timestamp(value):
+    """Parse an App Insights timestamp, which may carry 7 fractional digits."""
+    match = re.match(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?', str(value))
+    if not match:
+        return None
+    fraction = (match.group(2) or '.0')[:7].ljust(7, '0')
+    return datetime.fromisoformat(match.group(1) + fraction).replace(tzinfo=timezone.utc)
+
+
+def _is_complete(result):
+    """Whether a found command's timeline is final and so safe to cache."""
+    timeline = result["timeline"] or []
+    if any(TERMINAL_MESSAGE.match(str(event["message"])) for event in timeline):
+        return True
+    newest = _parse_timestamp(timeline[-1]["timestamp"]) if timeline else None
+    return newest is not None and (datetime.now(timezone.utc) - newest).total_seconds() > INGESTION_WINDOW_SECONDS
+
+
+def _error_result(e):
+    return {
+        "success": False,
+        "message": f"Error querying App Insights: {str(e)}",
+        "commandDetails": None,
+        "timeline": None
+    }
+
 
 class AppInsightsClient:
-    def __init__(self, api_key, app_id):
+    """Query App Insights traces for MOO command IDs.
+
+    `base_url` selects the query backend. It defaults to APPINSIGHTS_BASE_URL
+    or the public App Insights API, and can point at a local stand-in such as
+    `fake_appinsights.py`. Completed commands are cached per (API key, app ID,
+    command ID, time range); misses and timelines that may still be ingesting
+    are not, as the command may still be running.
+    """
+
+    def __init__(self, api_key, app_id, base_url=None, session=None, cache=None):
         self.api_key = api_key
+        # Part of the cache key, so a wrong or revoked key never gets another key's traces
+        self._api_key_hash = hashlib.sha256(str(api_key).encode()).hexdigest()[:16]
         self.app_id = app_id
-        self.base_url = "https://api.applicationinsights.io/v1/apps"
+        self.base_url = base_url or os.environ.get("APPINSIGHTS_BASE_URL", DEFAULT_BASE_URL)
+        self.session = session or _session
+        self.cache = cache if cache is not None else _cache
         self.headers = {
             "X-Api-Key": api_key,
             "Content-Type": "application/json"
@@ -24,68 +169,92 @@ class AppInsightsClient:
         start_time = now - delta
         return start_time.isoformat(), now.isoformat()
 
+    def _cache_key(self, command_id, time_range):
+        return (self.base_url, self._api_key_hash, self.app_id, command_id, time_range)
+
+    def _query(self, query):
+        response = self.session.post(
+            f"{self.base_url}/{self.app_id}/query",
+            headers=self.headers,
+            json={"query": query},
+            timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        data = response.json()
+        if not data.get("tables"):
+            return []
+        return data["tables"][0].get("rows") or []
+
     def search_command(self, command_id, time_range="24h"):
+        cached = self.cache.get(self._cache_key(command_id, time_range))
+        if cached is not None:
+            return cached
+
         start_time, end_time = self._get_time_range(time_range)
-        
+
         # Query for command details
         query = f"""
         traces
-        | where customDimensions.commandId == "{command_id}"
+        | where customDimensions.commandId == {_kql_string(command_id)}
         | where timestamp between(datetime("{start_time}") .. datetime("{end_time}"))
         | project timestamp, message, severityLevel, customDimensions
         | order by timestamp asc
         """
-        
+
         try:
-            response = requests.post(
-                f"{self.base_url}/{self.app_id}/query",
-                headers=self.headers,
-                json={"query": query}
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Process the results
-            if not data.get("tables") or not data["tables"][0].get("rows"):
-                return {
-                    "success": False,
-                    "message": "No command data found for the specified ID",
-                    "commandDetails": None,
-                    "timeline": None
-                }
-            
-            # Extract command details and timeline
-            rows = data["tables"][0]["rows"]
-            command_details = {
-                "start_time": rows[0][0],
-                "end_time": rows[-1][0],
-                "total_events": len(rows),
-                "severity_levels": list(set(row[2] for row in rows)),
-                "custom_dimensions": rows[0][3] if rows[0][3] else {}
-            }
-            
-            timeline = [
-                {
-                    "timestamp": row[0],
-                    "message": row[1],
-                    "severity": row[2],
-                    "details": row[3]
-                }
-                for row in rows
-            ]
-            
-            return {
-                "success": True,
-                "message": "Command data retrieved successfully",
-                "commandDetails": command_details,
-                "timeline": timeline
-            }
-            
+            result = _build_result(self._query(query))
         except requests.exceptions.RequestException as e:
-            return {
-                "success": False,
-                "message": f"Error querying App Insights: {str(e)}",
-                "commandDetails": None,
-                "timeline": None
-            } 
\ No newline at end of file
+            return _error_result(e)
+
+        if result["success"] and _is_complete(result):
+            self.cache.set(self._cache_key(command_id, time_range), result)
+        return result
+
+    def _search_batch(self, command_ids, time_range):
+        start_time, end_time = self._get_time_range(time_range)
+        id_list = ", ".join(_kql_string(command_id) for command_id in command_ids)
+
+        query = f"""
+        traces
+        | where tostring(customDimensions.commandId) in ({id_list})
+        | where timestamp between(datetime("{start_time}") .. datetime("{end_time}"))
+        | project timestamp, message, severityLevel, customDimensions, commandId = tostring(customDimensions.commandId)
+        | order by timestamp asc
+        """
+
+        try:
+            rows = self._query(query)
+        except requests.exceptions.RequestException as e:
+            return {command_id: _error_result(e) for command_id in command_ids}
+
+        rows_by_command = {}
+        for row in rows:
+            rows_by_command.setdefault(row[4], []).append(row[:4])
+
+        results = {}
+        for command_id in command_ids:
+            result = _build_result(rows_by_command.get(command_id))
+            if result["success"] and _is_complete(result):
+                self.cache.set(self._cache_key(command_id, time_range), result)
+            results[command_id] = result
+        return results
+
+    def search_commands(self, command_ids, time_range="24h"):
+        """Look up many command IDs, BATCH_SIZE per `in (...)` query, in parallel."""
+        results = {}
+        pending = []
+        for command_id in dict.fromkeys(str(command_id) for command_id in command_ids):
+            cached = self.cache.get(self._cache_key(command_id, time_range))
+            if cached is not None:
+                results[command_id] = cached
+            else:
+                pending.append(command_id)
+
+        batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+        if len(batches) == 1:
+            results.update(self._search_batch(batches[0], time_range))
+        elif batches:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_QUERIES, len(batches))) as pool:
+                for batch_results in pool.map(lambda batch: self._search_batch(batch, time_range), batches):
+                    results.update(batch_results)
+        return results
@@ -0,0 +1,285 @@
+"""Measure the tester's own overhead and check its statistics against ground truth.
+
+Everything runs against `fake_moo.py` with a throwaway store, results
+database and ledger, so no archive is needed:
+
+    python bench_harness.py --iterations 200 --concurrency 8
+
+It reports:
+
+- spawn: `run_moo_command` (reader threads, reaper, rusage) against a bare
+  `subprocess.run` of the same command
+- flask: `POST /api/execute-command` against calling `run_moo_command` directly
+- json: serializing `moo ls` results of growing size
+- ground truth: a load run with a fixed latency, jitter, failure rate and
+  concurrency, and a rate-limited run, checked against the fake's ledger
+- throughput: a `moo get` transfer-thread sweep at a known bandwidth
+
+and exits with status 1 if any ground-truth check fails.
+"""
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JSON_LISTING_SIZES = (10, 1000, 20000)
+POLL_INTERVAL = 0.05
+
+
+def percentile(values, quantile):
+    """Exact percentile (0-100) using the same rank rule as `LatencyHistogram`."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile / 100 * (len(ordered) - 1)))]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def read_ledger(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        entries = [json.loads(line) for line in f]
+    os.remove(path)
+    # Load runs probe `moo --version` once before their first iteration
+    return [entry for entry in entries if entry['args'] != ['--version']]
+
+
+def peak_overlap(entries):
+    """Largest number of fake `moo` processes that were running at once."""
+    edges = sorted([(entry['start'], 1) for entry in entries] + [(entry['end'], -1) for entry in entries],
+                   key=lambda edge: (edge[0], edge[1]))
+    running = peak = 0
+    for _, change in edges:
+        running += change
+        peak = max(peak, running)
+    return peak
+
+
+class Report:
+    def __init__(self):
+        self.sections = {}
+        self.checks = []
+
+    def add(self, section, name, value):
+        self.sections.setdefault(section, {})[name] = value
+        shown = f'{value:.3f}' if isinstance(value, float) else value
+        print(f'  {name:<40} {shown}')
+
+    def check(self, name, passed, detail):
+        self.checks.append({'check': name, 'passed': bool(passed), 'detail': detail})
+        print(f"  [{'PASS' if passed else 'FAIL'}] {name}: {detail}")
+
+    @property
+    def passed(self):
+        return all(check['passed'] for check in self.checks)
+
+
+def set_model(latency_ms=0, jitter_ms=0, failure_rate=0, bandwidth_mbps=0):
+    os.environ.update({
+        'FAKE_MOO_LATENCY_MS': str(latency_ms),
+        'FAKE_MOO_JITTER_MS': str(jitter_ms),
+        'FAKE_MOO_FAILURE_RATE': str(failure_rate),
+        'FAKE_MOO_BANDWIDTH_MBPS': str(bandwidth_mbps)
+    })
+
+
+def wait_for_run(client, run_id):
+    while True:
+        run = client.get(f'/api/load-runs/{run_id}').get_json()['run']
+        if run['status'] in ('completed', 'cancelled', 'failed'):
+            return client.get(f'/api/load-runs/{run_id}?since=0').get_json()['run']
+        time.sleep(POLL_INTERVAL)
+
+
+def start_run(client, **body):
+    response = client.post('/api/load-runs', json=body)
+    if response.status_code != 202:
+        raise RuntimeError(response.get_json()['message'])
+    return wait_for_run(client, response.get_json()['runId'])
+
+
+def bench_spawn(report, run_moo_command, moo_command, repeat):
+    print('spawn overhead')
+    set_model()
+    bare = timed(lambda: subprocess.run(moo_command(['si']), capture_output=True), repeat)
+    harness = timed(lambda: run_moo_command(['si']), repeat)
+    spawn = [run_moo_command(['si'])['timing']['spawnMs'] for _ in range(repeat)]
+    report.add('spawn', 'bare subprocess.run median (ms)', statistics.median(bare))
+    report.add('spawn', 'run_moo_command median (ms)', statistics.median(harness))
+    report.add('spawn', 'harness overhead median (ms)', statistics.median(harness) - statistics.median(bare))
+    report.add('spawn', 'Popen spawn median (ms)', statistics.median(spawn))
+
+
+def bench_flask(report, client, run_moo_command, repeat):
+    print('flask request handling')
+    set_model()
+    direct = timed(lambda: run_moo_command(['si']), repeat)
+    via_flask = timed(lambda: client.post('/api/execute-command', json={'args': ['si']}), repeat)
+    report.add('flask', 'direct median (ms)', statistics.median(direct))
+    report.add('flask', 'POST /api/execute-command median (ms)', statistics.median(via_flask))
+    report.add('flask', 'request handling overhead median (ms)', statistics.median(via_flask) - statistics.median(direct))
+
+
+def bench_json(report, app, run_moo_command, store, repeat):
+    from flask import jsonify
+
+    print('json serialization')
+    set_model()
+    for entries in JSON_LISTING_SIZES:
+        directory = os.path.join(store, 'listing', str(entries))
+        os.makedirs(directory, exist_ok=True)
+        for i in range(entries):
+            open(os.path.join(directory, f'file-{i:08d}.pp'), 'w').close()
+        result = run_moo_command(['ls', f'moose:/listing/{entries}', '--size'])
+        with app.app_context():
+            serialize = timed(lambda: jsonify(result).get_data(), repeat)
+            size = len(jsonify(result).get_data())
+        report.add('json', f'ls of {entries} entries: response bytes', size)
+        report.add('json', f'ls of {entries} entries: jsonify median (ms)', statistics.median(serialize))
+
+
+def check_ground_truth(report, client, ledger, iterations, concurrency, latency_ms, jitter_ms, failure_rate):
+    print('ground truth: concurrency, outcomes and latency statistics')
+    set_model(latency_ms, jitter_ms, failure_rate)
+    started = time.perf_counter()
+    run = start_run(client, args=['si'], iterations=iterations, concurrency=concurrency, delayMs=0)
+    wall_seconds = time.perf_counter() - started
+    truth = read_ledger(ledger)
+
+    report.check('every iteration ran exactly once', len(truth) == iterations and run['completed'] == iterations,
+                 f"{run['completed']} reported, {len(truth)} processes in ledger, {iterations} requested")
+    truth_succeeded = sum(1 for entry in truth if entry['exitCode'] == 0)
+    report.check('success count matches ledger', run['succeeded'] == truth_succeeded,
+                 f"{run['succeeded']} reported, {truth_succeeded} in ledger")
+    report.check('peak concurrency matches setting', peak_overlap(truth) == concurrency,
+                 f'{peak_overlap(truth)} processes at once, {concurrency} configured')
+
+    # The run keeps every result while iterations <= MAX_RETAINED_RESULTS, so exact values are known
+    timings = [result['serverTiming'] for result in run['results'] if result.get('serverTiming') is not None]
+    histogram = client.get(f"/api/load-runs/{run['runId']}/histogram").get_json()['histogram']
+    stats = histogram['stats']
+    exact_mean = statistics.fmean(timings)
+    report.check('histogram mean is exact', abs(stats['meanMs'] - exact_mean) <= 1e-6 * exact_mean,
+                 f"{stats['meanMs']:.4f} vs {exact_mean:.4f} ms")
+    for name, quantile in (('p50', 50), ('p90', 90), ('p99', 99)):
+        exact = percentile(timings, quantile)
+        reported = stats[f'{name}Ms']
+        tolerance = histogram['relativeError'] * exact
+        report.check(f'histogram {name} within relative error', abs(reported - exact) <= tolerance + 1e-9,
+                     f'{reported:.2f} vs {exact:.2f} ms')
+
+    injected = [entry['delayMs'] for entry in truth]
+    report.check('latencies include the injected delay', min(timings) >= latency_ms,
+                 f'min {min(timings):.2f} ms, injected {latency_ms}-{latency_ms + jitter_ms} ms')
+    process_ms = statistics.fmean((entry['end'] - entry['start']) * 1000 for entry in truth)
+    report.add('ground truth', 'mean injected delay (ms)', statistics.fmean(injected))
+    report.add('ground truth', 'mean fake process runtime (ms)', process_ms)
+    report.add('ground truth', 'mean reported latency (ms)', exact_mean)
+    report.add('ground truth', 'startup + harness per iteration (ms)', exact_mean - process_ms)
+    report.add('ground truth', 'achieved parallelism', sum(timings) / 1000 / wall_seconds)
+
+
+def check_rate(report, client, ledger, iterations, rate):
+    print('ground truth: target rate')
+    set_model()
+    start_run(client, args=['si'], iterations=iterations, concurrency=4, rate=rate, delayMs=0)
+    starts = sorted(entry['start'] for entry in read_ledger(ledger))
+    achieved = (len(starts) - 1) / (starts[-1] - starts[0]) if len(starts) > 1 else 0.0
+    report.check('achieved rate matches target', abs(achieved - rate) <= 0.05 * rate,
+                 f'{achieved:.2f}/s for a target of {rate}/s')
+
+
+def check_throughput(report, client, ledger, store, downloads, bandwidth_mbps):
+    from ppgen import parse_size, write_pp_file
+
+    print('ground truth: throughput against a known bandwidth')
+    os.makedirs(os.path.join(store, 'bench'), exist_ok=True)
+    write_pp_file(os.path.join(store, 'bench', 'fixture.pp'), parse_size('16MiB'))
+    set_model(bandwidth_mbps=bandwidth_mbps)
+    run = start_run(client, args=['get', 'moose:/bench/fixture.pp', downloads, '--force'],
+                    iterations=3, sweep={'transferThreads': [1, 2, 4]}, verifyPp=True, delayMs=0)
+    read_ledger(ledger)
+    report.check('verified downloads all succeed', run['succeeded'] == run['totalIterations'],
+                 f"{run['succeeded']} of {run['totalIterations']}")
+
+    curves = client.get(f"/api/load-runs/{run['runId']}/throughput").get_json()['throughput']['byThreads']
+    for point in curves:
+        ceiling = bandwidth_mbps * point['transferThreads']
+        report.check(f"{point['transferThreads']} thread(s) stays under the modelled bandwidth",
+                     point['maxMBps'] <= ceiling * 1.05,
+                     f"mean {point['meanMBps']:.1f} MB/s, ceiling {ceiling:.1f} MB/s")
+    means = [point['meanMBps'] for point in curves]
+    report.check('throughput rises with transfer threads', means == sorted(means),
+                 ', '.join(f'{mean:.1f}' for mean in means))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the tester against fake_moo.py.')
+    parser.add_argument('--iterations', type=int, default=200, help='iterations of the ground-truth load run')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--failure-rate', type=float, default=0.1)
+    parser.add_argument('--rate', type=float, default=5, help='target rate for the rate-limited run')
+    parser.add_argument('--bandwidth-mbps', type=float, default=50)
+    parser.add_argument('--repeat', type=int, default=30, help='samples per overhead measurement')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bench-harness-')
+    store = os.path.join(workdir, 'store')
+    downloads = os.path.join(workdir, 'downloads')
+    ledger = os.path.join(workdir, 'ledger.jsonl')
+    os.makedirs(store)
+    os.makedirs(downloads)
+    # Read at import time by loadrunner and app, and inherited by every fake moo process
+    os.environ.update({
+        'MOO_COMMAND': f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(HERE, 'fake_moo.py'))}",
+        'FAKE_MOO_STORE': store,
+        'FAKE_MOO_LEDGER': ledger,
+        'RESULTS_DB': os.path.join(workdir, 'results.db')
+    })
+    sys.path.insert(0, HERE)
+    from app import app
+    from loadrunner import MAX_RETAINED_RESULTS, moo_command, run_moo_command
+
+    if not 1 <= args.iterations <= MAX_RETAINED_RESULTS:
+        parser.error(f'--iterations must be between 1 and {MAX_RETAINED_RESULTS} so every result is kept')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    report = Report()
+    print(f'Working directory: {workdir}')
+    bench_spawn(report, run_moo_command, moo_command, args.repeat)
+    bench_flask(report, client, run_moo_command, args.repeat)
+    bench_json(report, app, run_moo_command, store, args.repeat)
+    read_ledger(ledger)
+    check_ground_truth(report, client, ledger, args.iterations, args.concurrency,
+                       args.latency_ms, args.jitter_ms, args.failure_rate)
+    check_rate(report, client, ledger, max(20, int(args.rate * 2)), args.rate)
+    check_throughput(report, client, ledger, store, downloads, args.bandwidth_mbps)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'sections': report.sections, 'checks': report.checks}, f, indent=2)
+    print('All checks passed' if report.passed else 'Some checks FAILED')
+    return 0 if report.passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Local stand-in for the App Insights query API.
+
+Serves `POST /v1/apps/<app_id>/query` for the trace queries that
+`AppInsightsClient` sends, answering both single-ID (`==`) and batched
+(`in (...)`) lookups with deterministic synthetic traces. Point the tester
+at it with:
+
+    python fake_appinsights.py
+    APPINSIGHTS_BASE_URL=http://localhost:5001/v1/apps python app.py
+
+FAKE_APPINSIGHTS_LATENCY_MS adds a fixed delay to every query. Command IDs
+starting with "missing" return no traces, and those starting with "running"
+return a recent timeline that has not reached "Command completed" yet.
+"""
+from flask import Flask, request, jsonify
+from datetime import datetime, timedelta
+import hashlib
+import os
+import re
+import time
+
+app = Flask(__name__)
+
+QUERY_LATENCY_MS = float(os.environ.get('FAKE_APPINSIGHTS_LATENCY_MS', '0'))
+STRING_LITERAL = re.compile(r'"((?:[^"\\]|\\.)*)"')
+COMMAND_FILTER = re.compile(r'commandId\)?\s*(?:==\s*("(?:[^"\\]|\\.)*")|in\s*\(([^)]*)\))')
+COLUMNS = [
+    {'name': 'timestamp', 'type': 'datetime'},
+    {'name': 'message', 'type': 'string'},
+    {'name': 'severityLevel', 'type': 'int'},
+    {'name': 'customDimensions', 'type': 'dynamic'}
+]
+STAGES = ('Command received', 'Request queued', 'Transfer started', 'Transfer completed', 'Command completed')
+
+
+def _unescape(literal):
+    return re.sub(r'\\(.)', r'\1', literal)
+
+
+def requested_command_ids(query):
+    match = COMMAND_FILTER.search(query)
+    if match is None:
+        return []
+    return [_unescape(literal) for literal in STRING_LITERAL.findall(match.group(1) or match.group(2))]
+
+
+def synthetic_traces(command_id):
+    """Return the same plausible trace timeline every time for a command ID."""
+    if command_id.startswith('missing'):
+        return []
+
+    seed = int.from_bytes(hashlib.sha256(command_id.encode()).digest()[:8], 'big')
+    running = command_id.startswith('running')
+    age = timedelta(seconds=30) if running else timedelta(minutes=seed % 600 + 1)
+    start = datetime.utcnow().replace(microsecond=0) - age
+    offset_ms = 0
+    rows = []
+    for stage_index, message in enumerate(STAGES[:3] if running else STAGES):
+        offset_ms += (seed >> (stage_index * 8)) % 2000 + 10
+        rows.append([
+            (start + timedelta(milliseconds=offset_ms)).isoformat() + 'Z',
+            message,
+            1,
+            {'commandId': command_id, 'stage': str(stage_index), 'elapsedMs': str(offset_ms)}
+        ])
+    return rows
+
+
+@app.route('/v1/apps/<app_id>/query', methods=['POST'])
+def query(app_id):
+    if not request.headers.get('X-Api-Key'):
+        return jsonify({'error': {'message': 'Missing API key'}}), 401
+    if QUERY_LATENCY_MS:
+        time.sleep(QUERY_LATENCY_MS / 1000)
+
+    kql = request.get_json().get('query', '')
+    batched = ' in (' in kql
+    rows = []
+    for command_id in requested_command_ids(kql):
+        for row in synthetic_traces(command_id):
+            rows.append(row + [command_id] if batched else row)
+    rows.sort(key=lambda row: row[0])
+
+    columns = COLUMNS + [{'name': 'commandId', 'type': 'string'}] if batched else COLUMNS
+    return jsonify({'tables': [{'name': 'PrimaryResult', 'columns': columns, 'rows': rows}]})
+
+
+if __name__ == '__main__':
+    app.run(port=int(os.environ.get('FAKE_APPINSIGHTS_PORT', '5001')), threaded=True)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Local stand-in for the `moo` client and the MOOSE archive behind it.
+
+Implements `ls`, `si`, `get`, `put`, `login`, `logout` and `--version` over a
+plain directory (FAKE_MOO_STORE), where `moose:/a/b/c` is the file `a/b/c`.
+Point the tester at it with:
+
+    MOO_COMMAND="python fake_moo.py" python app.py
+
+Every invocation can be shaped by environment variables:
+
+    FAKE_MOO_LATENCY_MS                fixed delay before the command runs
+    FAKE_MOO_JITTER_MS                 extra uniformly distributed delay
+    FAKE_MOO_BANDWIDTH_MBPS            get/put rate per transfer thread (MB/s; 0 is unlimited)
+    FAKE_MOO_MAX_TRANSFER_THREADS      cap on `--transfer-threads` (default 4)
+    FAKE_MOO_FAILURE_RATE              probability (0-1) of a simulated system error
+    FAKE_MOO_LEDGER                    file to append one JSON line per invocation to
+
+The ledger records what really happened (start and end times, injected
+delay, outcome, bytes moved), which is the ground truth `bench_harness.py`
+checks the tester's own statistics against.
+"""
+import json
+import os
+import posixpath
+import random
+import sys
+import time
+import uuid
+
+VERSION = 'moo fake-1.0'
+URI_SCHEME = 'moose:'
+COPY_CHUNK_BYTES = 1 << 20
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake-moose-store')
+SESSION_FILE = '.session'
+
+# Exit codes follow the real client: 2 for user errors, 3 for system errors
+EXIT_USER_ERROR = 2
+EXIT_SYSTEM_ERROR = 3
+
+STORE = os.environ.get('FAKE_MOO_STORE', DEFAULT_STORE)
+LATENCY_MS = float(os.environ.get('FAKE_MOO_LATENCY_MS', '0'))
+JITTER_MS = float(os.environ.get('FAKE_MOO_JITTER_MS', '0'))
+BANDWIDTH_MBPS = float(os.environ.get('FAKE_MOO_BANDWIDTH_MBPS', '0'))
+MAX_TRANSFER_THREADS = int(os.environ.get('FAKE_MOO_MAX_TRANSFER_THREADS', '4'))
+FAILURE_RATE = float(os.environ.get('FAKE_MOO_FAILURE_RATE', '0'))
+LEDGER = os.environ.get('FAKE_MOO_LEDGER')
+
+
+class MooError(Exception):
+    def __init__(self, message, exit_code=EXIT_USER_ERROR):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def split_args(args):
+    """Split arguments into positionals and a dict of `--flag[=value]` options."""
+    positionals, options = [], {}
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1:
+            name, _, value = arg.lstrip('-').partition('=')
+            options[name] = value or True
+        else:
+            positionals.append(arg)
+    return positionals, options
+
+
+def store_path(uri):
+    """Map `moose:/a/b` (or the shorthand `:/a/b`) to its file in the store."""
+    if uri.startswith(URI_SCHEME):
+        path = uri[len(URI_SCHEME):]
+    elif uri.startswith(':/'):
+        path = uri[1:]
+    else:
+        raise MooError(f'Invalid MOOSE URI: {uri}')
+    relative = posixpath.normpath('/' + path).lstrip('/')
+    return os.path.join(STORE, *relative.split('/')) if relative else STORE
+
+
+def store_uri(path):
+    relative = os.path.relpath(path, STORE).replace(os.sep, '/')
+    return URI_SCHEME + '/' + ('' if relative == '.' else relative)
+
+
+def copy_throttled(source, destination, threads):
+    """Copy a file at no more than BANDWIDTH_MBPS per transfer thread."""
+    rate = BANDWIDTH_MBPS * 1e6 * max(1, min(threads, MAX_TRANSFER_THREADS))
+    copied = 0
+    start = time.monotonic()
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            dst.write(chunk)
+            copied += len(chunk)
+            if rate:
+                ahead = copied / rate - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+    return copied
+
+
+def transfer_threads(options):
+    try:
+        return int(options.get('transfer-threads', 1))
+    except ValueError:
+        raise MooError('--transfer-threads must be a whole number')
+
+
+def command_ls(positionals, options, record):
+    uris = positionals or [URI_SCHEME + '/']
+    for uri in uris:
+        path = store_path(uri)
+        if not os.path.exists(path):
+            raise MooError(f'ERROR: {uri} does not exist')
+        if os.path.isdir(path) and 'directory' not in options:
+            if 'recursive' in options:
+                entries = sorted(os.path.join(root, name) for root, dirs, files in os.walk(path)
+                                 for name in dirs + files)
+            else:
+                entries = sorted(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            entries = [path]
+
+        for entry in entries:
+            if os.path.basename(entry) == SESSION_FILE:
+                continue
+            line = store_uri(entry)
+            if 'size' in options or 'l' in options:
+                line = f'{os.path.getsize(entry):>14} {line}'
+            if 'time' in options:
+                line = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(os.path.getmtime(entry)))} {line}"
+            print(line)
+
+
+def command_si(positionals, options, record):
+    session_path = os.path.join(STORE, SESSION_FILE)
+    user = None
+    if os.path.exists(session_path):
+        with open(session_path) as f:
+            user = f.read().strip() or None
+    info = {
+        'URL': URI_SCHEME + '/',
+        'Version': VERSION,
+        'Store': STORE,
+        'Logged in as': user or '(not logged in)'
+    }
+    if 'long' in options:
+        info.update({
+            'Simulated latency (ms)': f'{LATENCY_MS} + up to {JITTER_MS}',
+            'Simulated bandwidth (MB/s per thread)': BANDWIDTH_MBPS or 'unlimited',
+            'Simulated failure rate': FAILURE_RATE
+        })
+    if 'xml' in options:
+        print('<?xml version="1.0"?>\n<systemInformation>')
+        for key, value in info.items():
+            print(f'  <item name="{key}">{value}</item>')
+        print('</systemInformation>')
+    else:
+        for key, value in info.items():
+            print(f'{key}: {value}')
+
+
+def _skip_existing(destination, options, source_size):
+    """Decide whether an existing destination is skipped, overwritten or an error."""
+    if not os.path.exists(destination):
+        return False
+    if 'force' in options or 'f' in options:
+        return False
+    if 'force-excluding-identical' in options or 'fill-gaps-and-overwrite-smaller-files' in options:
+        return os.path.getsize(destination) >= source_size
+    if 'fill-gaps' in options or 'i' in options:
+        return True
+    raise MooError(f'ERROR: {destination} already exists')
+
+
+def command_get(positionals, options, record):
+    if len(positionals) < 2:
+        raise MooError('Usage: moo get [options] URI... DEST')
+    *uris, dest = positionals
+    if len(uris) > 1 and not os.path.isdir(dest):
+        raise MooError(f'ERROR: {dest} must be a directory when getting several files')
+
+    command_id = uuid.uuid4().hex
+    threads = transfer_threads(options)
+    total = sum(os.path.getsize(store_path(uri)) for uri in uris if os.path.isfile(store_path(uri)))
+    print(f'### get, command-id={command_id}, estimated-cost={total}byte(s), files={len(uris)}', flush=True)
+    for uri in uris:
+        source = store_path(uri)
+        if not os.path.isfile(source):
+            raise MooError(f'ERROR: {uri} does not exist')
+        destination = os.path.join(dest, posixpath.basename(uri)) if os.path.isdir(dest) else dest
+        if _skip_existing(destination, options, os.path.getsize(source)):
+            continue
+        record['bytes'] += copy_throttled(source, destination, threads)
+        if 'verbose' in options:
+            print(f'### get: {uri} -> {destination}', flush=True)
+
+
+def command_put(positionals, options, record):
+    if len(positionals) < 2:
+        raise MooError('Usage: moo put [options] FILE... URI')
+    *sources, uri = positionals
+    target = store_path(uri)
+    if len(sources) > 1 and not uri.endswith('/') and not os.path.isdir(target):
+        raise MooError(f'ERROR: {uri} must be a directory when putting several files')
+
+    command_id = uuid.uuid4().hex
+    threads = transfer_threads(options)
+    missing = [source for source in sources if not os.path.isfile(source)]
+    if missing:
+        raise MooError(f'ERROR: {missing[0]} does not exist')
+    total = sum(os.path.getsize(source) for source in sources)
+    if 'quiet' not in options:
+        print(f'### put, command-id={command_id}, estimated-cost={total}byte(s), files={len(sources)}', flush=True)
+    if 'dry-run' in options:
+        return
+
+    for source in sources:
+        destination = target
+        if len(sources) > 1 or uri.endswith('/') or os.path.isdir(target):
+            destination = os.path.join(target, os.path.basename(source))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if _skip_existing(destination, options, os.path.getsize(source)):
+            continue
+        record['bytes'] += copy_throttled(source, destination, threads)
+        if 'verbose' in options:
+            print(f'### put: {source} -> {store_uri(destination)}', flush=True)
+
+
+def command_login(positionals, options, record):
+    user = options.get('username') if isinstance(options.get('username'), str) else None
+    if user is None and 'username' in options and positionals:
+        user = positionals[0]
+    os.makedirs(STORE, exist_ok=True)
+    with open(os.path.join(STORE, SESSION_FILE), 'w') as f:
+        f.write(user or os.environ.get('USER', 'moose-user'))
+    print('Login successful')
+
+
+def command_logout(positionals, options, record):
+    try:
+        os.remove(os.path.join(STORE, SESSION_FILE))
+    except FileNotFoundError:
+        pass
+    print('Logout successful')
+
+
+COMMANDS = {
+    'ls': command_ls,
+    'si': command_si,
+    'get': command_get,
+    'put': command_put,
+    'login': command_login,
+    'logout': command_logout
+}
+
+
+def _append_ledger(record):
+    # One short O_APPEND write per invocation, so concurrent processes never interleave
+    with open(LEDGER, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def main(argv):
+    record = {'pid': os.getpid(), 'args': argv, 'start': time.time(), 'delayMs': 0.0,
+              'bytes': 0, 'injectedFailure': False}
+    exit_code = 0
+    try:
+        if argv[:1] == ['--version']:
+            print(VERSION)
+            return 0
+        if not argv or argv[0] not in COMMANDS:
+            raise MooError(f"Usage: moo {{{','.join(COMMANDS)}}} [options] [arguments]")
+
+        record['delayMs'] = LATENCY_MS + random.uniform(0, JITTER_MS)
+        time.sleep(record['delayMs'] / 1000)
+        if random.random() < FAILURE_RATE:
+            record['injectedFailure'] = True
+            raise MooError('ERROR: simulated system error', EXIT_SYSTEM_ERROR)
+
+        positionals, options = split_args(argv[1:])
+        COMMANDS[argv[0]](positionals, options, record)
+    except MooError as e:
+        print(str(e), file=sys.stderr)
+        exit_code = e.exit_code
+    except OSError as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        exit_code = EXIT_SYSTEM_ERROR
+    finally:
+        record['end'] = time.time()
+        record['exitCode'] = exit_code
+        if LEDGER:
+            _append_ledger(record)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
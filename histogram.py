@@ -0,0 +1,133 @@
+import math
+import threading
+
+DEFAULT_RELATIVE_ERROR = 0.01
+MIN_TRACKABLE_MS = 0.001
+SUMMARY_PERCENTILES = (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9))
+
+
+class LatencyHistogram:
+    """Mergeable latency histogram with logarithmic buckets.
+
+    Bucket `i` holds values in (gamma^(i-1), gamma^i], so every percentile is
+    reported within `relative_error` of the true value. Memory depends only on
+    the range of latencies seen (about 1,200 buckets between 1 microsecond and
+    one hour at 1%), never on the number of recorded values. Mean and standard
+    deviation are tracked exactly with Welford's algorithm.
+    """
+
+    def __init__(self, relative_error=DEFAULT_RELATIVE_ERROR):
+        self.relative_error = relative_error
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self._counts = {}
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return self._count
+
+    def _index(self, value):
+        return math.ceil(math.log(max(value, MIN_TRACKABLE_MS)) / self._log_gamma)
+
+    def record(self, value):
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self._count += 1
+            delta = value - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (value - self._mean)
+            self._min = min(self._min, value)
+            self._max = max(self._max, value)
+
+    def merge(self, other):
+        """Add another histogram's values into this one."""
+        if other.relative_error != self.relative_error:
+            raise ValueError('Cannot merge histograms with different relative errors')
+        with other._lock:
+            counts = dict(other._counts)
+            count, mean, m2 = other._count, other._mean, other._m2
+            low, high = other._min, other._max
+        if not count:
+            return self
+
+        with self._lock:
+            for index, bucket_count in counts.items():
+                self._counts[index] = self._counts.get(index, 0) + bucket_count
+            total = self._count + count
+            delta = mean - self._mean
+            self._m2 += m2 + delta * delta * self._count * count / total
+            self._mean += delta * count / total
+            self._count = total
+            self._min = min(self._min, low)
+            self._max = max(self._max, high)
+        return self
+
+    def copy(self):
+        return LatencyHistogram(self.relative_error).merge(self)
+
+    def _bucket_value(self, index):
+        # Midpoint (in relative terms) of the bucket, within relative_error of any value in it
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def _percentiles(self, quantiles):
+        """Walk the buckets once, resolving each quantile (0-100) in ascending order."""
+        results = {}
+        pending = sorted(quantiles)
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            while pending and seen > pending[0] / 100 * (self._count - 1):
+                value = self._bucket_value(index)
+                results[pending.pop(0)] = min(max(value, self._min), self._max)
+            if not pending:
+                break
+        return results
+
+    def percentile(self, quantile):
+        with self._lock:
+            if not self._count:
+                return None
+            return self._percentiles([quantile])[quantile]
+
+    def summary(self):
+        with self._lock:
+            if not self._count:
+                return {'count': 0}
+            percentiles = self._percentiles([quantile for _, quantile in SUMMARY_PERCENTILES])
+            data = {
+                'count': self._count,
+                'meanMs': self._mean,
+                'stddevMs': math.sqrt(self._m2 / (self._count - 1)) if self._count > 1 else 0.0,
+                'minMs': self._min,
+                'maxMs': self._max
+            }
+        for name, quantile in SUMMARY_PERCENTILES:
+            data[f'{name}Ms'] = percentiles[quantile]
+        return data
+
+    def buckets(self):
+        """Return the non-empty buckets in ascending order."""
+        with self._lock:
+            counts = sorted(self._counts.items())
+        return [
+            {
+                'lowerMs': self._gamma ** (index - 1),
+                'upperMs': self._gamma ** index,
+                'count': bucket_count
+            }
+            for index, bucket_count in counts
+        ]
+
+    def to_dict(self):
+        return {
+            'relativeError': self.relative_error,
+            'stats': self.summary(),
+            'buckets': self.buckets()
+        }
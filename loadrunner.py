@@ -0,0 +1,511 @@
+import codecs
+import itertools
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from histogram import LatencyHistogram
+from ppfile import verify_download
+from throughput import ThroughputCurves, add_throughput, expand_sweep, with_worker_destination
+
+# The client to run, e.g. "python fake_moo.py" to benchmark against the local stand-in
+MOO_COMMAND = shlex.split(os.environ.get('MOO_COMMAND', 'moo'))
+COMMAND_TIMEOUT = 300
+MAX_ITERATIONS = 100000
+MAX_CONCURRENCY = 64
+MAX_RETAINED_RUNS = 50
+MAX_BUFFERED_EVENTS = 10000
+MAX_BUFFERED_OUTPUT = 2000
+MAX_EVENT_OUTPUT_CHARS = 4096
+MAX_RETAINED_RESULTS = 1000
+READ_CHUNK_SIZE = 65536
+READER_DRAIN_TIMEOUT = 5
+
+
+def _pump(stream, name, chunks, marks, on_output):
+    """Read a child's pipe in chunks, recording when the first and last bytes arrive."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with stream:
+        while True:
+            data = stream.read1(READ_CHUNK_SIZE)
+            if not data:
+                break
+            now = time.perf_counter()
+            marks.setdefault(f'{name}_first', now)
+            marks[f'{name}_last'] = now
+            text = decoder.decode(data)
+            chunks.append(text)
+            if on_output and text:
+                on_output(name, text)
+    chunks.append(decoder.decode(b'', final=True))
+
+
+def _read_proc_io(pid):
+    """Return the I/O counters of an exited child that has not been reaped yet."""
+    try:
+        with open(f'/proc/{pid}/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return {}
+    return {
+        'readBytes': int(counters['read_bytes']),
+        'writtenBytes': int(counters['write_bytes']),
+        'readChars': int(counters['rchar']),
+        'writtenChars': int(counters['wchar'])
+    }
+
+
+def _reap(process, marks, resources):
+    """Wait for the child and collect the resource usage of that child alone.
+
+    `RUSAGE_CHILDREN` is shared by every concurrent invocation, so the child is
+    reaped with `wait4` instead, after reading its `/proc/<pid>/io` while it is
+    still a zombie. Without `waitid` (macOS before Python 3.13) the zombie
+    cannot be inspected, so only the rusage is collected.
+    """
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        marks['exit'] = time.perf_counter()
+        return
+
+    if hasattr(os, 'waitid'):
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        marks['exit'] = time.perf_counter()
+        resources.update(_read_proc_io(process.pid))
+        _, status, usage = os.wait4(process.pid, 0)
+    else:
+        _, status, usage = os.wait4(process.pid, 0)
+        marks['exit'] = time.perf_counter()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    resources.update({
+        'userCpuMs': usage.ru_utime * 1000,
+        'systemCpuMs': usage.ru_stime * 1000,
+        'maxRssKb': usage.ru_maxrss
+    })
+
+
+def _elapsed_ms(start, mark):
+    return (mark - start) * 1000 if mark is not None else None
+
+
+def moo_command(args):
+    """Return the command line running `moo` with `args`."""
+    return MOO_COMMAND + list(args)
+
+
+def detect_client_version():
+    """Return the installed `moo` client's version string, if it reports one."""
+    try:
+        result = subprocess.run(moo_command(['--version']), capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return (result.stdout or result.stderr).strip() or None
+
+
+def run_moo_command(args, timeout=COMMAND_TIMEOUT, on_output=None):
+    """Run a single `moo` invocation and return the dashboard result dict.
+
+    `on_output(stream, text)` is called from reader threads for every chunk the
+    process writes, while it is still running.
+
+    Besides the overall `serverTiming`, the result carries a `timing`
+    breakdown (milliseconds from just before the spawn until the process was
+    started, wrote its first stdout byte, wrote its last byte and exited) and
+    the child's own `resources` (CPU time, peak RSS and I/O counters).
+    """
+    start_time = time.time()
+    started = time.perf_counter()
+    try:
+        # A session of its own lets a timeout kill everything the client started
+        process = subprocess.Popen(moo_command(args), stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, start_new_session=True)
+    except OSError as e:
+        return {
+            'success': False,
+            'message': str(e)
+        }
+    spawned = time.perf_counter()
+
+    stdout, stderr = [], []
+    marks, resources = {}, {}
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, 'stdout', stdout, marks, on_output), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, 'stderr', stderr, marks, on_output), daemon=True)
+    ]
+    reaper = threading.Thread(target=_reap, args=(process, marks, resources), daemon=True)
+    for thread in readers + [reaper]:
+        thread.start()
+
+    deadline = time.monotonic() + timeout
+    reaper.join(timeout)
+    timed_out = reaper.is_alive()
+    if not timed_out:
+        # Grandchildren that inherited the pipes can keep them open after the client exits
+        for reader in readers:
+            reader.join(max(0.0, deadline - time.monotonic()))
+        timed_out = any(reader.is_alive() for reader in readers)
+    if timed_out:
+        # Popen.kill() would poll, and could reap the child from under the reaper
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        reaper.join()
+        for reader in readers:
+            reader.join(READER_DRAIN_TIMEOUT)
+
+    if timed_out:
+        return {
+            'success': False,
+            'message': f'Command timed out after {timeout} seconds',
+            'error': 'Timeout'
+        }
+
+    end_time = time.time()
+    server_time_ms = (end_time - start_time) * 1000
+    last_byte = max((marks[key] for key in ('stdout_last', 'stderr_last') if key in marks), default=None)
+
+    return {
+        'success': process.returncode == 0,
+        'message': 'Command executed successfully' if process.returncode == 0 else 'Command failed',
+        'output': ''.join(stdout),
+        'error': ''.join(stderr),
+        'serverTiming': server_time_ms,
+        'timing': {
+            'spawnMs': _elapsed_ms(started, spawned),
+            'firstByteMs': _elapsed_ms(started, marks.get('stdout_first')),
+            'lastByteMs': _elapsed_ms(started, last_byte),
+            'exitMs': _elapsed_ms(started, marks.get('exit'))
+        },
+        'resources': resources
+    }
+
+
+def _event_result(result):
+    """Copy a result for an `iteration` event, keeping only the tail of output already streamed."""
+    data = dict(result)
+    for key in ('output', 'error'):
+        text = data.get(key)
+        if text and len(text) > MAX_EVENT_OUTPUT_CHARS:
+            data[key] = f'[{len(text) - MAX_EVENT_OUTPUT_CHARS} earlier characters omitted]\n' + text[-MAX_EVENT_OUTPUT_CHARS:]
+    return data
+
+
+class LoadRun:
+    """A batch of `moo` invocations executed on a bounded worker pool.
+
+    Each worker claims the next iteration, waits for its slot when a target
+    rate is set, runs the command and then sleeps for `delay_ms` before
+    claiming another one. The run executes on a daemon thread, so it keeps
+    going after the browser that started it has gone away.
+
+    An optional `sweep` ({'sources': [...], 'transferThreads': [...]}) expands
+    the command into one case per combination; every case runs `iterations`
+    times, one case after another.
+
+    When a `store` is given, the run and each of its iterations are appended
+    to it, tagged with the `moo` client version.
+
+    With `verify_pp`, every `.pp` file written by `moo get` is checked with
+    `ppfile.verify_download`; malformed downloads count as failures.
+
+    With more than one worker, each `moo get` downloads into its worker's
+    own `worker-<n>` directory under the destination, so no iteration
+    measures or verifies a file another one is still writing.
+
+    Progress is also published as a sequence of numbered events (`iteration`,
+    `status` and a final `end`) that streaming clients can follow and resume
+    with `wait_for_events`. Only the latest MAX_BUFFERED_EVENTS are kept.
+    Process `output` chunks are numbered and buffered separately (the latest
+    MAX_BUFFERED_OUTPUT), so chatty commands never push results out.
+    Output already streamed is cut down to its tail in `iteration` events.
+
+    Only the latest MAX_RETAINED_RESULTS results are kept in memory as well;
+    latency statistics come from a `LatencyHistogram` and throughput from
+    running curves, so soak runs use constant memory.
+    """
+
+    def __init__(self, args, iterations, concurrency=1, rate=None, delay_ms=0, sweep=None,
+                 client_version=None, store=None, verify_pp=False):
+        if not isinstance(args, list) or not args or not all(isinstance(arg, str) for arg in args):
+            raise ValueError('args must be a non-empty list of strings')
+        sweep = sweep or {}
+        if not isinstance(sweep, dict):
+            raise ValueError('sweep must be an object')
+        sources = sweep.get('sources') or None
+        transfer_threads = sweep.get('transferThreads') or None
+        if sources is not None:
+            if not isinstance(sources, list) or len(args) < 2 or not all(isinstance(source, str) and source for source in sources):
+                raise ValueError('sweep sources must be non-empty strings replacing the first command argument')
+        if transfer_threads is not None:
+            if not isinstance(transfer_threads, list) or not all(isinstance(threads, int) and threads > 0 for threads in transfer_threads):
+                raise ValueError('sweep transferThreads must be positive integers')
+        cases = expand_sweep(args, sources, transfer_threads)
+        if not 1 <= iterations * len(cases) <= MAX_ITERATIONS:
+            raise ValueError(f'iterations across all sweep cases must be between 1 and {MAX_ITERATIONS}')
+        if not 1 <= concurrency <= MAX_CONCURRENCY:
+            raise ValueError(f'concurrency must be between 1 and {MAX_CONCURRENCY}')
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be a positive number of iterations per second')
+        if delay_ms < 0:
+            raise ValueError('delayMs must not be negative')
+
+        self.id = uuid.uuid4().hex
+        self.args = args
+        self.iterations = iterations
+        self.sweep = {'sources': sources, 'transferThreads': transfer_threads}
+        self.cases = cases
+        self.total_iterations = iterations * len(cases)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.delay_ms = delay_ms
+        self.client_version = client_version
+        self.store = store
+        self.verify_pp = verify_pp
+        self.status = 'pending'
+        self.error = None
+        self.results = deque(maxlen=MAX_RETAINED_RESULTS)
+        self.completed = 0
+        self.succeeded = 0
+        self.histogram = LatencyHistogram()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._events_changed = threading.Condition(self._lock)
+        self._events = deque(maxlen=MAX_BUFFERED_EVENTS)
+        self._last_event_id = 0
+        self._output_events = deque(maxlen=MAX_BUFFERED_OUTPUT)
+        self._last_output_id = 0
+        self._cancelled = threading.Event()
+        self._next_iteration = 0
+        self._next_slot = None
+        self._throughput = ThroughputCurves()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'cancelled', 'failed')
+
+    def start(self):
+        threading.Thread(target=self._run, name=f'load-run-{self.id[:8]}', daemon=True).start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _publish(self, event, data):
+        with self._lock:
+            self._publish_locked(event, data)
+
+    def _publish_locked(self, event, data):
+        self._last_event_id += 1
+        self._events.append({'id': self._last_event_id, 'event': event, 'data': data})
+        self._events_changed.notify_all()
+
+    def _publish_output(self, data):
+        with self._lock:
+            self._last_output_id += 1
+            self._output_events.append({'id': self._last_output_id, 'event': 'output', 'data': data})
+            self._events_changed.notify_all()
+
+    @property
+    def last_output_id(self):
+        return self._last_output_id
+
+    @staticmethod
+    def _newer(buffer, last_id, after):
+        # IDs are contiguous, so the events after `after` are the last `last_id - after`
+        count = min(len(buffer), max(0, last_id - after))
+        newest_first = list(itertools.islice(reversed(buffer), count))
+        newest_first.reverse()
+        return newest_first
+
+    def wait_for_events(self, after=0, after_output=0, timeout=None):
+        """Return (events, output events) newer than the two cursors, blocking up to `timeout`."""
+        with self._lock:
+            if self._last_event_id <= after and self._last_output_id <= after_output and not self.finished:
+                self._events_changed.wait(timeout)
+            return (self._newer(self._events, self._last_event_id, after),
+                    self._newer(self._output_events, self._last_output_id, after_output))
+
+    def _run(self):
+        self.status = 'running'
+        self.started_at = time.time()
+        self._publish('status', {'status': self.status})
+        try:
+            if self.store:
+                if self.client_version is None:
+                    self.client_version = detect_client_version()
+                self.store.record_run(self)
+            with ThreadPoolExecutor(max_workers=self.concurrency,
+                                    thread_name_prefix=f'load-run-{self.id[:8]}') as pool:
+                workers = [pool.submit(self._worker, worker) for worker in range(self.concurrency)]
+                for worker in workers:
+                    worker.result()
+        except Exception as e:
+            self.error = str(e)
+            status = 'failed'
+        else:
+            status = 'cancelled' if self._cancelled.is_set() else 'completed'
+
+        # Finish and publish atomically so streams never miss the `end` event
+        with self._lock:
+            self.status = status
+            self.finished_at = time.time()
+            self._publish_locked('status', {'status': self.status, 'error': self.error})
+            self._publish_locked('end', {})
+
+    def _claim_iteration(self):
+        """Reserve the next iteration number and, if rate limited, its start time."""
+        with self._lock:
+            if self._cancelled.is_set() or self._next_iteration >= self.total_iterations:
+                return None
+            iteration = self._next_iteration
+            self._next_iteration += 1
+
+            slot = None
+            if self.rate:
+                now = time.monotonic()
+                slot = max(now, self._next_slot or now)
+                self._next_slot = slot + 1.0 / self.rate
+            return iteration, slot
+
+    def _worker(self, worker):
+        while True:
+            claim = self._claim_iteration()
+            if claim is None:
+                return
+            iteration, slot = claim
+
+            if slot is not None and self._cancelled.wait(max(0.0, slot - time.monotonic())):
+                return
+
+            def on_output(stream, text, iteration=iteration + 1):
+                self._publish_output({'iteration': iteration, 'stream': stream, 'text': text})
+
+            case = self.cases[iteration // self.iterations]
+            args = case['args']
+            if self.concurrency > 1:
+                separated = with_worker_destination(args, worker)
+                if separated is not None:
+                    args, directory = separated
+                    os.makedirs(directory, exist_ok=True)
+            started_at = time.time()
+            result = run_moo_command(args, on_output=on_output)
+            add_throughput(result, args)
+            if self.verify_pp:
+                verify_download(result, args)
+            result['iteration'] = iteration + 1
+            result['startedAt'] = started_at
+            result['params'] = case['params']
+            with self._lock:
+                self.results.append(result)
+                self.completed += 1
+                self.succeeded += int(result['success'])
+                self._throughput.add(result)
+                self._publish_locked('iteration', _event_result(result))
+            if result.get('serverTiming') is not None:
+                self.histogram.record(result['serverTiming'])
+            if self.store:
+                self.store.record_iteration(self, result)
+
+            if self.delay_ms and self._cancelled.wait(self.delay_ms / 1000):
+                return
+
+    def to_dict(self, since=None):
+        """Summarise the run; pass `since` to include the retained results after that many."""
+        with self._lock:
+            completed, succeeded = self.completed, self.succeeded
+            results = None
+            if since is not None:
+                first_retained = completed - len(self.results)
+                results = list(self.results)[max(0, since - first_retained):]
+
+        data = {
+            'runId': self.id,
+            'status': self.status,
+            'error': self.error,
+            'command': 'moo ' + ' '.join(self.args),
+            'args': self.args,
+            'iterations': self.iterations,
+            'sweep': self.sweep,
+            'totalIterations': self.total_iterations,
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'delayMs': self.delay_ms,
+            'clientVersion': self.client_version,
+            'verifyPp': self.verify_pp,
+            'completed': completed,
+            'succeeded': succeeded,
+            'failed': completed - succeeded,
+            'stats': self.histogram.summary(),
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+        if results is not None:
+            data['results'] = results
+        return data
+
+    def throughput(self):
+        with self._lock:
+            return self._throughput.to_dict()
+
+
+class LoadRunManager:
+    """In-memory registry of load runs, keeping only the most recent ones.
+
+    Latency histograms of evicted runs are merged into one histogram per
+    command, so per-command statistics cover every run since startup.
+    """
+
+    def __init__(self, max_runs=MAX_RETAINED_RUNS, store=None):
+        self.max_runs = max_runs
+        self.store = store
+        self._runs = {}
+        self._evicted_histograms = {}
+        self._lock = threading.Lock()
+
+    def create(self, args, iterations, concurrency=1, rate=None, delay_ms=0, sweep=None,
+               client_version=None, verify_pp=False):
+        run = LoadRun(args, iterations, concurrency, rate, delay_ms, sweep, client_version, self.store,
+                      verify_pp)
+        with self._lock:
+            self._runs[run.id] = run
+            self._evict()
+        run.start()
+        return run
+
+    def get(self, run_id):
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def list(self):
+        with self._lock:
+            return sorted(self._runs.values(), key=lambda run: run.created_at, reverse=True)
+
+    def command_histogram(self, command):
+        """Merge the latency histograms of every run of a `moo` subcommand."""
+        with self._lock:
+            evicted = self._evicted_histograms.get(command)
+            histogram = evicted.copy() if evicted else LatencyHistogram()
+            runs = [run for run in self._runs.values() if run.args[0] == command]
+        for run in runs:
+            histogram.merge(run.histogram)
+        return histogram
+
+    def _evict(self):
+        # Only finished runs are dropped; active runs are never forgotten
+        finished = sorted((run for run in self._runs.values() if run.finished),
+                          key=lambda run: run.created_at)
+        while len(self._runs) > self.max_runs and finished:
+            run = self._runs.pop(finished.pop(0).id)
+            self._evicted_histograms.setdefault(run.args[0], LatencyHistogram()).merge(run.histogram)
@@ -0,0 +1,287 @@
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from throughput import transferred_path
+
+HEADER_WORDS = 64
+HEADER_BYTES = HEADER_WORDS * 4
+MARKER_BYTES = 4
+MAX_REPORTED_FIELDS = 100
+MAX_REPORTED_ERRORS = 20
+READ_CHUNK_BYTES = 1 << 20
+
+INT_HEADER_NAMES = (
+    'lbyr', 'lbmon', 'lbdat', 'lbhr', 'lbmin', 'lbday', 'lbyrd', 'lbmond', 'lbdatd', 'lbhrd',
+    'lbmind', 'lbdayd', 'lbtim', 'lbft', 'lblrec', 'lbcode', 'lbhem', 'lbrow', 'lbnpt', 'lbext',
+    'lbpack', 'lbrel', 'lbfc', 'lbcfc', 'lbproc', 'lbvc', 'lbrvc', 'lbexp', 'lbegin', 'lbnrec',
+    'lbproj', 'lbtyp', 'lblev', 'lbrsvd1', 'lbrsvd2', 'lbrsvd3', 'lbrsvd4', 'lbsrce', 'lbuser1', 'lbuser2',
+    'lbuser3', 'lbuser4', 'lbuser5', 'lbuser6', 'lbuser7'
+)
+REAL_HEADER_NAMES = (
+    'brsvd1', 'brsvd2', 'brsvd3', 'brsvd4', 'bdatum', 'bacc', 'blev', 'brlev', 'bhlev', 'bhrlev',
+    'bplat', 'bplon', 'bgor', 'bzy', 'bdy', 'bzx', 'bdx', 'bmdi', 'bmks'
+)
+
+# One 64-word lookup header: 45 big-endian integers followed by 19 big-endian reals
+HEADER_DTYPE = np.dtype([(name, '>i4') for name in INT_HEADER_NAMES]
+                        + [(name, '>f4') for name in REAL_HEADER_NAMES])
+
+# Everything from a field's first record marker up to and including its data record length
+FIELD_HEAD_DTYPE = np.dtype([('headStart', '>i4'), ('header', HEADER_DTYPE), ('headEnd', '>i4'), ('dataLength', '>i4')])
+FIELD_HEAD_BYTES = FIELD_HEAD_DTYPE.itemsize
+
+PACKING_NAMES = {
+    0: 'unpacked',
+    1: 'WGDOS',
+    2: 'CRAY 32-bit',
+    3: 'GRIB',
+    4: 'run-length encoded'
+}
+
+
+class FileChangedError(ValueError):
+    """The file was truncated or rewritten while it was being read."""
+
+
+def _read_exact(fd, length, offset):
+    """Read `length` bytes at `offset`, failing if the file has shrunk."""
+    data = os.pread(fd, length, offset)
+    if len(data) != length:
+        raise FileChangedError(f'File ended at byte {offset + len(data)} while it was being read')
+    return data
+
+
+def _read_heads(fd, offsets):
+    """Read the head (header record and data length) of the field at every offset."""
+    return np.frombuffer(b''.join(_read_exact(fd, FIELD_HEAD_BYTES, offset) for offset in offsets.tolist()),
+                         dtype=FIELD_HEAD_DTYPE)
+
+
+def _read_markers(fd, offsets):
+    return np.frombuffer(b''.join(_read_exact(fd, MARKER_BYTES, offset) for offset in offsets.tolist()),
+                         dtype='>i4')
+
+
+def _uniform_fields(fd, size, first_data_length):
+    """Return (offsets, heads) if every field has the same framing as the first, else None."""
+    stride = FIELD_HEAD_BYTES + first_data_length + MARKER_BYTES
+    if first_data_length < 0 or size % stride:
+        return None
+
+    offsets = np.arange(size // stride, dtype=np.int64) * stride
+    heads = _read_heads(fd, offsets)
+    trailing_markers = _read_markers(fd, offsets + FIELD_HEAD_BYTES + first_data_length)
+    framing_ok = (
+        np.all(heads['headStart'] == HEADER_BYTES)
+        and np.all(heads['headEnd'] == HEADER_BYTES)
+        and np.all(heads['dataLength'] == first_data_length)
+        and np.all(trailing_markers == first_data_length)
+    )
+    return (offsets, heads) if framing_ok else None
+
+
+def _walk_fields(fd, size):
+    """Follow the record markers field by field, stopping at the first framing error.
+
+    Only the head of each field and its trailing marker are read here;
+    payloads are never touched.
+    """
+    offsets, heads, errors = [], [], []
+    position = 0
+    while position < size:
+        if position + FIELD_HEAD_BYTES > size:
+            errors.append({'offset': position, 'message': f'{size - position} trailing bytes do not hold a complete field'})
+            break
+        head = _read_exact(fd, FIELD_HEAD_BYTES, position)
+        head_start, head_end = struct.unpack_from('>i', head, 0)[0], \
+            struct.unpack_from('>i', head, MARKER_BYTES + HEADER_BYTES)[0]
+        if head_start != HEADER_BYTES or head_end != HEADER_BYTES:
+            errors.append({'offset': position,
+                           'message': f'Header record markers are {head_start}/{head_end}, expected {HEADER_BYTES}'})
+            break
+
+        data_position = position + HEADER_BYTES + 2 * MARKER_BYTES
+        data_length = struct.unpack_from('>i', head, HEADER_BYTES + 2 * MARKER_BYTES)[0]
+        data_end = data_position + MARKER_BYTES + data_length
+        if data_length < 0 or data_end + MARKER_BYTES > size:
+            errors.append({'offset': data_position, 'message': f'Data record length {data_length} runs past the end of the file'})
+            break
+        trailing_length = struct.unpack_from('>i', _read_exact(fd, MARKER_BYTES, data_end))[0]
+        if trailing_length != data_length:
+            errors.append({'offset': data_end,
+                           'message': f'Data record markers are {data_length}/{trailing_length}'})
+            break
+
+        offsets.append(position)
+        heads.append(head)
+        position = data_end + MARKER_BYTES
+    return np.array(offsets, dtype=np.int64), np.frombuffer(b''.join(heads), dtype=FIELD_HEAD_DTYPE), errors
+
+
+def _field_layout(fd, size):
+    """Locate every field, returning (offsets, headers, data lengths, errors, framing)."""
+    if size < FIELD_HEAD_BYTES + MARKER_BYTES:
+        errors = [{'offset': 0, 'message': f'{size} bytes do not hold a complete field'}]
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=HEADER_DTYPE), np.zeros(0, dtype=np.int64), errors, None
+
+    first_data_length = int(np.frombuffer(_read_exact(fd, FIELD_HEAD_BYTES, 0), dtype=FIELD_HEAD_DTYPE)['dataLength'][0])
+    fields, errors, framing = _uniform_fields(fd, size, first_data_length), [], 'uniform'
+    if fields is None:
+        *fields, errors = _walk_fields(fd, size)
+        framing = 'walked'
+    offsets, heads = fields
+    return offsets, heads['header'], heads['dataLength'].astype(np.int64), errors, framing
+
+
+def _payload_crcs(f, data_starts, data_lengths):
+    """CRC-32 each data payload and all of them together, reading through one reused buffer."""
+    buffer = memoryview(bytearray(READ_CHUNK_BYTES))
+    field_crcs = []
+    combined_crc = 0
+    for start, length in zip(data_starts.tolist(), data_lengths.tolist()):
+        f.seek(start)
+        crc = 0
+        while length:
+            read = f.readinto(buffer[:min(length, READ_CHUNK_BYTES)])
+            if not read:
+                raise FileChangedError(f'File ended at byte {f.tell()} while it was being read')
+            crc = zlib.crc32(buffer[:read], crc)
+            combined_crc = zlib.crc32(buffer[:read], combined_crc)
+            length -= read
+        field_crcs.append(crc)
+    return field_crcs, combined_crc
+
+
+def _check_unchanged(fd, before):
+    after = os.fstat(fd)
+    if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+        raise FileChangedError(f'File changed while it was being read ({before.st_size} bytes, now {after.st_size})')
+
+
+def inspect_pp_file(path, checksums=True):
+    """Describe a PP fields file and check its Fortran record framing.
+
+    The file is never mapped or read whole: a download may still be writing
+    it, and a mapping of a file that shrinks kills the process with SIGBUS.
+    When every field has the same record lengths, which is the usual case for
+    a single diagnostic, the field offsets are computed up front and their
+    markers and lookup headers checked in one vectorized pass. Otherwise the
+    record markers are walked field by field. CRC-32 checksums are computed
+    from the data payloads in fixed-size chunks, so memory stays flat for
+    multi-GiB files. A file that changes during the scan is reported invalid.
+    """
+    with open(path, 'rb', buffering=0) as f:
+        before = os.fstat(f.fileno())
+        size = before.st_size
+        info = {
+            'path': path,
+            'sizeBytes': size,
+            'fieldCount': 0,
+            'framing': None,
+            'valid': False,
+            'errors': [],
+            'packing': {},
+            'dataLengths': None,
+            'lblrecMismatches': 0,
+            'checksum': None,
+            'fields': []
+        }
+        if size == 0:
+            info['errors'].append({'offset': 0, 'message': 'File is empty'})
+            return info
+
+        try:
+            offsets, headers, data_lengths, errors, framing = _field_layout(f.fileno(), size)
+            field_crcs, combined_crc = [], 0
+            if checksums:
+                data_starts = offsets + HEADER_BYTES + 3 * MARKER_BYTES
+                field_crcs, combined_crc = _payload_crcs(f, data_starts, data_lengths)
+            _check_unchanged(f.fileno(), before)
+        except FileChangedError as e:
+            info['errors'].append({'offset': None, 'message': str(e)})
+            return info
+
+    info['fieldCount'] = len(offsets)
+    info['framing'] = framing
+    info['errors'] = errors[:MAX_REPORTED_ERRORS]
+    info['valid'] = not errors and len(offsets) > 0
+
+    if len(offsets):
+        packing_codes, packing_counts = np.unique(headers['lbpack'] % 10, return_counts=True)
+        info['packing'] = {
+            PACKING_NAMES.get(int(code), f'unknown ({int(code)})'): int(count)
+            for code, count in zip(packing_codes, packing_counts)
+        }
+        info['dataLengths'] = {
+            'min': int(data_lengths.min()),
+            'max': int(data_lengths.max()),
+            'total': int(data_lengths.sum())
+        }
+        # LBLREC counts 32-bit words; payloads are often padded, so this is informational
+        info['lblrecMismatches'] = int(np.count_nonzero(headers['lblrec'].astype(np.int64) * 4 != data_lengths))
+
+    if checksums:
+        info['checksum'] = {'algorithm': 'crc32', 'combined': f'{combined_crc:08x}'}
+
+    reported = min(len(offsets), MAX_REPORTED_FIELDS)
+    info['fields'] = [
+        {
+            'index': i,
+            'offset': int(offsets[i]),
+            'dataLength': int(data_lengths[i]),
+            'lbpack': int(headers['lbpack'][i]),
+            'lblrec': int(headers['lblrec'][i]),
+            'stashCode': int(headers['lbuser4'][i]),
+            'forecastPeriod': int(headers['lbft'][i]),
+            'validity': f"{headers['lbyr'][i]:04d}-{headers['lbmon'][i]:02d}-{headers['lbdat'][i]:02d}T"
+                        f"{headers['lbhr'][i]:02d}:{headers['lbmin'][i]:02d}",
+            'crc32': f'{field_crcs[i]:08x}' if checksums else None
+        }
+        for i in range(reported)
+    ]
+    return info
+
+
+def read_headers(path):
+    """Return every lookup header of a PP file as a `HEADER_DTYPE` array."""
+    with open(path, 'rb', buffering=0) as f:
+        before = os.fstat(f.fileno())
+        if before.st_size == 0:
+            raise ValueError('File is empty')
+        _, headers, _, errors, _ = _field_layout(f.fileno(), before.st_size)
+        _check_unchanged(f.fileno(), before)
+    if errors:
+        raise ValueError(errors[0]['message'])
+    return headers
+
+
+def verify_download(result, args):
+    """Inspect the PP file a successful `moo get` wrote and fail the result if it is malformed.
+
+    Adds `ppVerification` to the result. The check runs after the command has
+    exited, so it never counts towards `serverTiming`.
+    """
+    path = transferred_path(args) if result.get('success') and args[0] == 'get' else None
+    if path is None or not path.lower().endswith('.pp'):
+        return result
+
+    start = time.perf_counter()
+    try:
+        info = inspect_pp_file(path)
+    except (OSError, ValueError) as e:
+        info = {'valid': False, 'fieldCount': 0, 'errors': [{'offset': None, 'message': str(e)}], 'checksum': None}
+    result['ppVerification'] = {
+        'valid': info['valid'],
+        'fieldCount': info['fieldCount'],
+        'errors': info['errors'],
+        'checksum': info['checksum'],
+        'verifyMs': (time.perf_counter() - start) * 1000
+    }
+    if not info['valid']:
+        result['success'] = False
+        result['message'] = f"Downloaded PP file failed verification: {info['errors'][0]['message']}"
+    return result
@@ -0,0 +1,264 @@
+"""Synthetic PP files for reproducible `moo get`/`moo put` benchmarks.
+
+Writes well-framed PP files of a target size and field count, with
+realistic lookup headers and payloads drawn from a seeded generator, so the
+same arguments always produce byte-identical files. Fields are either
+unpacked 32-bit reals (LBPACK=0) or WGDOS-style packed rows (LBPACK=1).
+Payloads are written in WRITE_CHUNK_BYTES chunks, so memory stays flat
+however large the file is.
+
+    python ppgen.py file out.pp --size 256MiB --fields 64 --packed --seed 7
+    python ppgen.py ladder pp-ladder --max-size 10GiB --moose-prefix moose:/adhoc/projects/perf
+
+`ladder` writes one file per size in LADDER_SIZES plus a `manifest.json`
+that the dashboard loads (`PP_LADDER_MANIFEST`) to fill the get/put sweeps.
+Files already matching the manifest are kept rather than regenerated.
+"""
+import argparse
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ppfile import HEADER_BYTES, HEADER_DTYPE, MARKER_BYTES
+
+DEFAULT_FIELD_BYTES = 1 << 20
+DEFAULT_COLUMNS = 1024
+DEFAULT_STASH_CODE = 3236  # 1.5m air temperature
+WRITE_CHUNK_BYTES = 8 << 20
+MAX_RECORD_BYTES = (1 << 31) - 1
+MAX_PACKED_ROWS = 0xFFFF
+PACKED_BITS = 16
+PACKED_ACCURACY = -12
+WGDOS_HEADER_WORDS = 3
+WGDOS_ROW_HEADER_WORDS = 2
+MISSING_DATA = -1073741824.0
+LADDER_SIZES = ('1MiB', '10MiB', '100MiB', '1GiB', '10GiB')
+MANIFEST_NAME = 'manifest.json'
+BASE_TIME = datetime(2000, 1, 1)
+
+SIZE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]i?B?|B)?\s*$', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(text):
+    """Parse sizes such as `1048576`, `512KiB` or `10GiB` (units are binary)."""
+    match = SIZE_PATTERN.match(str(text))
+    if not match:
+        raise ValueError(f'Invalid size: {text}')
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[(unit or '')[:1].upper()])
+
+
+def format_size(size):
+    for unit in ('TiB', 'GiB', 'MiB', 'KiB'):
+        scale = SIZE_UNITS[unit[0]]
+        if size >= scale and size % scale == 0:
+            return f'{size // scale}{unit}'
+    return f'{size}B'
+
+
+def _field_shape(data_bytes, packed, columns=DEFAULT_COLUMNS):
+    """Pick (rows, columns, words) so a field's data record is close to `data_bytes`."""
+    words = max(1, data_bytes // 4)
+    if packed:
+        # Two 16-bit values per word after the field and row headers
+        columns = min(columns, max(2, 2 * (words - WGDOS_HEADER_WORDS - WGDOS_ROW_HEADER_WORDS)))
+        columns -= columns % 2
+        row_words = WGDOS_ROW_HEADER_WORDS + columns // 2
+        rows = max(1, (words - WGDOS_HEADER_WORDS) // row_words)
+        return rows, columns, WGDOS_HEADER_WORDS + rows * row_words
+    columns = min(columns, words)
+    rows = max(1, words // columns)
+    return rows, columns, rows * columns
+
+
+def _header(index, rows, columns, words, packed, stash_code):
+    """Build the lookup header of field `index`, valid `index` hours after BASE_TIME."""
+    validity = BASE_TIME + timedelta(hours=index)
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    for name, value in (
+            ('lbyr', validity.year), ('lbmon', validity.month), ('lbdat', validity.day),
+            ('lbhr', validity.hour), ('lbmin', validity.minute), ('lbday', validity.timetuple().tm_yday),
+            ('lbyrd', BASE_TIME.year), ('lbmond', BASE_TIME.month), ('lbdatd', BASE_TIME.day),
+            ('lbtim', 11), ('lbft', index), ('lblrec', words), ('lbcode', 1), ('lbrow', rows),
+            ('lbnpt', columns), ('lbpack', 1 if packed else 0), ('lbrel', 3), ('lbfc', 16),
+            ('lbvc', 129), ('lblev', 9999), ('lbsrce', 1111), ('lbuser1', 1),
+            ('lbuser4', stash_code), ('lbuser7', 1),
+            ('bacc', PACKED_ACCURACY if packed else 0), ('bplat', 90.0), ('bplon', 0.0),
+            ('bdy', 180.0 / rows), ('bzy', -90.0 - 180.0 / rows),
+            ('bdx', 360.0 / columns), ('bzx', -360.0 / columns),
+            ('bmdi', MISSING_DATA), ('bmks', 1.0)):
+        header[name] = value
+    return header.tobytes()
+
+
+def _unpacked_chunks(rng, rows, columns):
+    words = rows * columns
+    chunk_words = WRITE_CHUNK_BYTES // 4
+    for start in range(0, words, chunk_words):
+        count = min(chunk_words, words - start)
+        yield (rng.random(count, dtype=np.float32) * 40 + 250).astype('>f4')
+
+
+def _packed_chunks(rng, rows, columns):
+    yield np.array([WGDOS_HEADER_WORDS + rows * (WGDOS_ROW_HEADER_WORDS + columns // 2),
+                    PACKED_ACCURACY, (columns << 16) | rows], dtype='>i4')
+
+    row_dtype = np.dtype([('base', '>f4'), ('control', '>u4'), ('values', '>u2', (columns,))])
+    chunk_rows = max(1, WRITE_CHUNK_BYTES // row_dtype.itemsize)
+    for start in range(0, rows, chunk_rows):
+        count = min(chunk_rows, rows - start)
+        chunk = np.empty(count, dtype=row_dtype)
+        chunk['base'] = rng.random(count, dtype=np.float32) * 40 + 250
+        chunk['control'] = (PACKED_BITS << 16) | (columns // 2)
+        chunk['values'] = rng.integers(0, 1 << PACKED_BITS, size=(count, columns), dtype=np.uint16)
+        yield chunk
+
+
+def write_pp_file(path, size_bytes, fields=None, packed=False, seed=0, stash_code=DEFAULT_STASH_CODE):
+    """Write a PP file of about `size_bytes` and return its manifest entry.
+
+    Every field gets the same shape, so the file is a little under the target
+    when it does not divide into whole rows. `crc32` covers the data payloads
+    and matches the combined checksum from `ppfile.inspect_pp_file`.
+    """
+    fields = fields or max(1, round(size_bytes / DEFAULT_FIELD_BYTES))
+    data_bytes = size_bytes // fields - HEADER_BYTES - 4 * MARKER_BYTES
+    if data_bytes < 4:
+        raise ValueError(f'{size_bytes} bytes is too small for {fields} fields')
+    if data_bytes > MAX_RECORD_BYTES:
+        raise ValueError(f'Fields cannot exceed {MAX_RECORD_BYTES} bytes; use more fields')
+    rows, columns, words = _field_shape(data_bytes, packed)
+    if packed and rows > MAX_PACKED_ROWS:
+        raise ValueError(f'Packed fields cannot exceed {MAX_PACKED_ROWS} rows; use more fields')
+
+    head_marker = struct.pack('>i', HEADER_BYTES)
+    data_marker = struct.pack('>i', words * 4)
+    chunks = _packed_chunks if packed else _unpacked_chunks
+    rng = np.random.default_rng(seed)
+    crc = 0
+    start = time.perf_counter()
+
+    # Written under a temporary name so an interrupted run never leaves a plausible fixture
+    partial_path = path + '.partial'
+    with open(partial_path, 'wb') as f:
+        for index in range(fields):
+            f.write(head_marker + _header(index, rows, columns, words, packed, stash_code) + head_marker)
+            f.write(data_marker)
+            for chunk in chunks(rng, rows, columns):
+                data = memoryview(chunk).cast('B')
+                crc = zlib.crc32(data, crc)
+                f.write(data)
+            f.write(data_marker)
+    os.replace(partial_path, path)
+
+    return {
+        'name': os.path.basename(path),
+        'path': path,
+        'targetBytes': size_bytes,
+        'sizeBytes': os.path.getsize(path),
+        'fieldCount': fields,
+        'fieldDataBytes': words * 4,
+        'rows': rows,
+        'columns': columns,
+        'lbpack': 1 if packed else 0,
+        'seed': seed,
+        'crc32': f'{crc:08x}',
+        'seconds': time.perf_counter() - start
+    }
+
+
+def ladder_file_name(size_bytes, packed):
+    return f"synthetic-{format_size(size_bytes)}{'-wgdos' if packed else ''}.pp"
+
+
+def load_manifest(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_ladder(directory, sizes=LADDER_SIZES, packed=False, seed=0, moose_prefix=None, on_file=None):
+    """Write one file per size into `directory`, plus a manifest describing them.
+
+    `moose_prefix` is where the files are (or will be) archived, and gives
+    each entry the `mooseUri` that `moo get` benchmarks fetch.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        previous = {entry['name']: entry for entry in load_manifest(manifest_path).get('files', [])}
+
+    entries = []
+    for size in sizes:
+        size_bytes = parse_size(size)
+        path = os.path.join(directory, ladder_file_name(size_bytes, packed))
+        entry = previous.get(os.path.basename(path))
+        reusable = (
+            entry is not None and entry['seed'] == seed and entry['targetBytes'] == size_bytes
+            and os.path.exists(path) and os.path.getsize(path) == entry['sizeBytes']
+        )
+        if not reusable:
+            entry = write_pp_file(path, size_bytes, packed=packed, seed=seed)
+        entry['path'] = os.path.abspath(path)
+        entry['mooseUri'] = f"{moose_prefix.rstrip('/')}/{entry['name']}" if moose_prefix else None
+        entries.append(entry)
+        if on_file:
+            on_file(entry, reusable)
+
+    manifest = {
+        'generator': 'ppgen',
+        'createdAt': time.time(),
+        'seed': seed,
+        'packed': packed,
+        'mooseUriPrefix': moose_prefix,
+        'files': entries
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic PP files for benchmarking.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    file_parser = commands.add_parser('file', help='write a single PP file')
+    file_parser.add_argument('path')
+    file_parser.add_argument('--size', required=True, help='target size, e.g. 64MiB')
+    file_parser.add_argument('--fields', type=int, help='number of fields (default: one per MiB)')
+
+    ladder_parser = commands.add_parser('ladder', help='write the standard size ladder and its manifest')
+    ladder_parser.add_argument('directory', nargs='?', default='pp-ladder')
+    ladder_parser.add_argument('--max-size', default=LADDER_SIZES[-1], help='largest ladder size to write')
+    ladder_parser.add_argument('--moose-prefix', help='MOOSE URI the ladder is archived under')
+
+    for subparser in (file_parser, ladder_parser):
+        subparser.add_argument('--packed', action='store_true', help='write WGDOS-style packed fields')
+        subparser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'file':
+        entry = write_pp_file(args.path, parse_size(args.size), args.fields, args.packed, args.seed)
+        print(json.dumps(entry, indent=2))
+        return
+
+    max_size = parse_size(args.max_size)
+    sizes = [size for size in LADDER_SIZES if parse_size(size) <= max_size]
+
+    def report(entry, reused):
+        action = 'kept' if reused else f"wrote in {entry['seconds']:.1f}s"
+        print(f"{entry['name']}: {entry['sizeBytes']} bytes, {entry['fieldCount']} fields ({action})")
+
+    build_ladder(args.directory, sizes, args.packed, args.seed, args.moose_prefix, on_file=report)
+    print(f'Manifest: {os.path.join(args.directory, MANIFEST_NAME)}')
+
+
+if __name__ == '__main__':
+    main()
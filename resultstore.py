@@ -0,0 +1,314 @@
+import logging
+import math
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'results.db'
+MAX_HISTORY_ROWS = 1000
+WRITE_BATCH_SIZE = 500
+SIGNIFICANCE_LEVEL = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    command TEXT NOT NULL,
+    command_line TEXT NOT NULL,
+    client_version TEXT,
+    iterations INTEGER NOT NULL,
+    concurrency INTEGER NOT NULL,
+    rate REAL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS iterations (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    command TEXT NOT NULL,
+    client_version TEXT,
+    started_at REAL NOT NULL,
+    success INTEGER NOT NULL,
+    response_ms REAL,
+    spawn_ms REAL,
+    first_byte_ms REAL,
+    last_byte_ms REAL,
+    exit_ms REAL,
+    user_cpu_ms REAL,
+    system_cpu_ms REAL,
+    max_rss_kb INTEGER,
+    bytes INTEGER,
+    throughput_mbps REAL,
+    transfer_threads INTEGER,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_command_created ON runs (command, created_at);
+CREATE INDEX IF NOT EXISTS idx_iterations_run ON iterations (run_id, iteration);
+CREATE INDEX IF NOT EXISTS idx_iterations_command_started ON iterations (command, started_at);
+CREATE INDEX IF NOT EXISTS idx_iterations_started ON iterations (started_at);
+CREATE INDEX IF NOT EXISTS idx_iterations_version ON iterations (client_version, command);
+"""
+
+ITERATION_COLUMNS = (
+    'run_id', 'iteration', 'command', 'client_version', 'started_at', 'success', 'response_ms',
+    'spawn_ms', 'first_byte_ms', 'last_byte_ms', 'exit_ms', 'user_cpu_ms', 'system_cpu_ms',
+    'max_rss_kb', 'bytes', 'throughput_mbps', 'transfer_threads', 'message'
+)
+
+# Aggregates are computed by SQLite; variance comes from the sum of squares
+AGGREGATE_COLUMNS = """
+    COUNT(id) AS iterations,
+    SUM(success) AS succeeded,
+    AVG(CASE WHEN success THEN response_ms END) AS mean_ms,
+    MIN(CASE WHEN success THEN response_ms END) AS min_ms,
+    MAX(CASE WHEN success THEN response_ms END) AS max_ms,
+    SUM(CASE WHEN success THEN response_ms END) AS sum_ms,
+    SUM(CASE WHEN success THEN response_ms * response_ms END) AS sum_squares,
+    SUM(success AND response_ms IS NOT NULL) AS samples,
+    AVG(throughput_mbps) AS mean_mbps
+"""
+
+
+def _iteration_to_dict(row):
+    return {
+        'id': row['id'],
+        'runId': row['run_id'],
+        'iteration': row['iteration'],
+        'command': row['command'],
+        'clientVersion': row['client_version'],
+        'startedAt': row['started_at'],
+        'success': bool(row['success']),
+        'responseMs': row['response_ms'],
+        'spawnMs': row['spawn_ms'],
+        'firstByteMs': row['first_byte_ms'],
+        'lastByteMs': row['last_byte_ms'],
+        'exitMs': row['exit_ms'],
+        'userCpuMs': row['user_cpu_ms'],
+        'systemCpuMs': row['system_cpu_ms'],
+        'maxRssKb': row['max_rss_kb'],
+        'bytes': row['bytes'],
+        'throughputMBps': row['throughput_mbps'],
+        'transferThreads': row['transfer_threads'],
+        'message': row['message']
+    }
+
+
+def _aggregate(row):
+    samples = row['samples'] or 0
+    variance = None
+    if samples > 1:
+        variance = max(0.0, (row['sum_squares'] - row['sum_ms'] ** 2 / samples) / (samples - 1))
+    return {
+        'iterations': row['iterations'],
+        'succeeded': row['succeeded'] or 0,
+        'samples': samples,
+        'meanMs': row['mean_ms'],
+        'minMs': row['min_ms'],
+        'maxMs': row['max_ms'],
+        'stddevMs': math.sqrt(variance) if variance is not None else None,
+        'varianceMs': variance,
+        'meanMBps': row['mean_mbps']
+    }
+
+
+def _betacf(a, b, x):
+    """Continued fraction for the regularized incomplete beta function (Lentz)."""
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        for numerator in (m * (b - m) * x / ((a + m2 - 1.0) * (a + m2)),
+                          -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def student_t_sf(t, df):
+    """Probability that a Student's t variable with `df` degrees of freedom exceeds `t`."""
+    tail = 0.5 * _betainc(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def welch_test(baseline, candidate, alpha=SIGNIFICANCE_LEVEL):
+    """One-sided Welch's t-test for the candidate being slower than the baseline."""
+    n1, n2 = baseline['samples'], candidate['samples']
+    if n1 < 2 or n2 < 2:
+        return None
+
+    v1, v2 = baseline['varianceMs'] / n1, candidate['varianceMs'] / n2
+    difference = candidate['meanMs'] - baseline['meanMs']
+    if v1 + v2 == 0:
+        # Identical samples on both sides: any slowdown at all is certain
+        p_value = 0.0 if difference > 0 else 1.0
+        t, df = None, n1 + n2 - 2
+    else:
+        t = difference / math.sqrt(v1 + v2)
+        df = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+        p_value = student_t_sf(t, df)
+
+    return {
+        'differenceMs': difference,
+        'changePercent': difference / baseline['meanMs'] * 100 if baseline['meanMs'] else None,
+        'tStatistic': t,
+        'degreesOfFreedom': df,
+        'pValue': p_value,
+        'alpha': alpha,
+        'regression': p_value < alpha
+    }
+
+
+class ResultStore:
+    """Append-only SQLite store for load run iterations.
+
+    Inserts are queued and written in batches by a single writer thread, so
+    workers never wait on the database. Reads open their own connection.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        self._queue = queue.Queue()
+        threading.Thread(target=self._write_loop, name='result-store-writer', daemon=True).start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for sql, params in batch:
+                        conn.execute(sql, params)
+            except sqlite3.Error:
+                logger.exception('Failed to store %d results', len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        self._queue.join()
+
+    def record_run(self, run):
+        self._queue.put((
+            'INSERT OR IGNORE INTO runs (run_id, command, command_line, client_version, '
+            'iterations, concurrency, rate, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (run.id, run.args[0], 'moo ' + ' '.join(run.args), run.client_version,
+             run.total_iterations, run.concurrency, run.rate, run.created_at)
+        ))
+
+    def record_iteration(self, run, result):
+        timing = result.get('timing') or {}
+        resources = result.get('resources') or {}
+        params = result.get('params') or {}
+        values = (
+            run.id, result['iteration'], run.args[0], run.client_version, result['startedAt'],
+            int(result['success']), result.get('serverTiming'), timing.get('spawnMs'),
+            timing.get('firstByteMs'), timing.get('lastByteMs'), timing.get('exitMs'),
+            resources.get('userCpuMs'), resources.get('systemCpuMs'), resources.get('maxRssKb'),
+            result.get('bytes'), result.get('throughputMBps'), params.get('transferThreads'),
+            result.get('message')
+        )
+        self._queue.put((
+            f"INSERT INTO iterations ({', '.join(ITERATION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in ITERATION_COLUMNS)})",
+            values
+        ))
+
+    def history(self, command=None, run_id=None, since=None, until=None, limit=100):
+        """Return the most recent stored iterations matching the filters."""
+        clauses, params = [], []
+        for column, operator, value in (('command', '=', command), ('run_id', '=', run_id),
+                                        ('started_at', '>=', since), ('started_at', '<', until)):
+            if value is not None:
+                clauses.append(f'{column} {operator} ?')
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        params.append(max(1, min(limit, MAX_HISTORY_ROWS)))
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT * FROM iterations {where} ORDER BY started_at DESC LIMIT ?', params
+            ).fetchall()
+        return [_iteration_to_dict(row) for row in rows]
+
+    def runs(self, command=None, limit=100):
+        """Return stored runs with their aggregates, newest first."""
+        where = 'WHERE command = ?' if command else ''
+        params = [command] if command else []
+        params.append(max(1, min(limit, MAX_HISTORY_ROWS)))
+
+        # Pick the page of runs first so only their iterations are aggregated
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT r.*, {AGGREGATE_COLUMNS} '
+                f'FROM (SELECT * FROM runs {where} ORDER BY created_at DESC LIMIT ?) r '
+                f'LEFT JOIN iterations i ON i.run_id = r.run_id '
+                f'GROUP BY r.run_id ORDER BY r.created_at DESC', params
+            ).fetchall()
+
+        return [
+            {
+                'runId': row['run_id'],
+                'command': row['command'],
+                'commandLine': row['command_line'],
+                'clientVersion': row['client_version'],
+                'concurrency': row['concurrency'],
+                'rate': row['rate'],
+                'createdAt': row['created_at'],
+                'stats': _aggregate(row)
+            }
+            for row in rows
+        ]
+
+    def aggregate(self, run_id=None, client_version=None, command=None):
+        """Compute latency aggregates for one run, or one client version of a command."""
+        if run_id is not None:
+            where, params = 'run_id = ?', [run_id]
+        else:
+            where, params = 'client_version = ? AND command = ?', [client_version, command]
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT {AGGREGATE_COLUMNS} FROM iterations WHERE {where}', params).fetchone()
+        return _aggregate(row)
+
+    def compare(self, baseline, candidate):
+        """Compare two aggregates, flagging a statistically significant slowdown."""
+        return {
+            'baseline': baseline,
+            'candidate': candidate,
+            'test': welch_test(baseline, candidate)
+        }
@@ -0,0 +1,200 @@
+import re
+import threading
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+import appinsights
+import fake_appinsights
+from appinsights import BATCH_SIZE, AppInsightsClient, TTLCache
+
+BASE_URL = 'http://appinsights.test/v1/apps'
+
+
+class FakeResponse:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self._data = response.get_json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code} Error', response=self)
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """Stands in for the pooled `requests.Session`, answering from `fake_appinsights` in process."""
+
+    def __init__(self):
+        self.client = fake_appinsights.app.test_client()
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        with self._lock:
+            self.queries.append(json['query'])
+        return FakeResponse(self.client.post(urlsplit(url).path, headers=headers, json=json))
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+
+@pytest.fixture
+def cache():
+    return TTLCache()
+
+
+def client(session, cache, api_key='key-a'):
+    return AppInsightsClient(api_key, 'app-1', base_url=BASE_URL, session=session, cache=cache)
+
+
+def test_search_command(session, cache):
+    result = client(session, cache).search_command('cmd-1')
+
+    assert result['success'] is True
+    assert [event['message'] for event in result['timeline']] == list(fake_appinsights.STAGES)
+    assert result['commandDetails']['total_events'] == len(fake_appinsights.STAGES)
+    assert '== "cmd-1"' in session.queries[0]
+
+
+def test_search_command_escapes_ids(session, cache):
+    result = client(session, cache).search_command('cmd "quoted"')
+
+    assert result['success'] is True
+    assert result['timeline'][0]['details']['commandId'] == 'cmd "quoted"'
+
+
+def test_missing_command(session, cache):
+    result = client(session, cache).search_command('missing-1')
+
+    assert result['success'] is False
+    assert result['timeline'] is None
+
+
+def test_batches_are_split_into_in_queries(session, cache):
+    command_ids = [f'cmd-{i}' for i in range(BATCH_SIZE * 2 + 20)] + ['missing-1', 'missing-2']
+    results = client(session, cache).search_commands(command_ids + ['cmd-0'])
+
+    batch_sizes = sorted(len(re.findall(r'"[^"]*"', query.split(' in (')[1].split(')')[0])) for query in session.queries)
+    assert batch_sizes == [22, BATCH_SIZE, BATCH_SIZE]
+    assert all(' in (' in query for query in session.queries)
+    assert list(results) == command_ids
+    for command_id in command_ids:
+        result = results[command_id]
+        assert result['success'] is not command_id.startswith('missing')
+        if result['success']:
+            assert {event['details']['commandId'] for event in result['timeline']} == {command_id}
+
+
+def test_cache_hits_skip_the_query(session, cache):
+    appinsights_client = client(session, cache)
+    first = appinsights_client.search_command('cmd-1')
+    appinsights_client.search_commands(['cmd-2', 'cmd-3'])
+    queries = len(session.queries)
+
+    assert appinsights_client.search_command('cmd-1') == first
+    assert set(appinsights_client.search_commands(['cmd-1', 'cmd-2', 'cmd-3'])) == {'cmd-1', 'cmd-2', 'cmd-3'}
+    assert len(session.queries) == queries == 2
+
+
+def test_cache_is_per_time_range(session, cache):
+    appinsights_client = client(session, cache)
+    appinsights_client.search_command('cmd-1', '24h')
+    appinsights_client.search_command('cmd-1', '7d')
+
+    assert len(session.queries) == 2
+
+
+def test_incomplete_timelines_are_not_cached(session, cache):
+    appinsights_client = client(session, cache)
+    result = appinsights_client.search_command('running-1')
+    appinsights_client.search_command('running-1')
+    appinsights_client.search_commands(['running-2'])
+    appinsights_client.search_commands(['running-2'])
+
+    assert result['success'] is True
+    assert len(result['timeline']) == 3
+    assert len(session.queries) == 4
+
+
+def test_misses_are_not_cached(session, cache):
+    appinsights_client = client(session, cache)
+    appinsights_client.search_command('missing-1')
+    appinsights_client.search_command('missing-1')
+
+    assert len(session.queries) == 2
+
+
+def test_cache_is_separated_by_api_key(session, cache):
+    client(session, cache, api_key='key-a').search_command('cmd-1')
+    client(session, cache, api_key='key-a').search_command('cmd-1')
+    client(session, cache, api_key='key-b').search_command('cmd-1')
+
+    assert len(session.queries) == 2
+
+
+def test_rejected_key_is_an_error_and_not_cached(session, cache):
+    appinsights_client = client(session, cache, api_key='')
+    result = appinsights_client.search_command('cmd-1')
+    batch = appinsights_client.search_commands(['cmd-1', 'cmd-2'])
+
+    assert result['success'] is False
+    assert result['message'].startswith('Error querying App Insights: 401')
+    assert all(not batch_result['success'] for batch_result in batch.values())
+    assert len(session.queries) == 2
+
+
+def timeline(*events):
+    return {'timeline': [{'timestamp': timestamp, 'message': message} for timestamp, message in events]}
+
+
+def test_is_complete():
+    assert appinsights._is_complete(timeline(('2999-01-01T00:00:00.1234567Z', 'Command completed')))
+    assert appinsights._is_complete(timeline(('2000-01-01T00:00:00.1234567Z', 'Transfer started')))
+    assert not appinsights._is_complete(timeline(('2999-01-01T00:00:00Z', 'Transfer started')))
+    assert not appinsights._is_complete(timeline(('not a timestamp', 'Transfer started')))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(appinsights.time, 'monotonic', clock)
+    ttl_cache = TTLCache(ttl=10)
+    ttl_cache.set('key', 'value')
+
+    clock.now += 9
+    assert ttl_cache.get('key') == 'value'
+    clock.now += 2
+    assert ttl_cache.get('key') is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    ttl_cache = TTLCache(max_entries=2)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+    assert ttl_cache.get('a') == 1
+    ttl_cache.set('c', 3)
+
+    assert ttl_cache.get('b') is None
+    assert ttl_cache.get('a') == 1
+    assert ttl_cache.get('c') == 3
+
+
+def test_ttl_cache_clear():
+    ttl_cache = TTLCache()
+    ttl_cache.set('a', 1)
+    ttl_cache.clear()
+
+    assert ttl_cache.get('a') is None
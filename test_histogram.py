@@ -0,0 +1,103 @@
+import random
+import statistics
+
+import pytest
+
+from histogram import LatencyHistogram
+
+
+def exact_percentile(values, quantile):
+    """Percentile using the histogram's rank rule: the value at rank floor(q * (n - 1))."""
+    ordered = sorted(values)
+    return ordered[int(quantile / 100 * (len(ordered) - 1))]
+
+
+@pytest.fixture
+def latencies():
+    rng = random.Random(42)
+    return [rng.lognormvariate(4, 1) for _ in range(20000)]
+
+
+def filled(values, relative_error=0.01):
+    histogram = LatencyHistogram(relative_error)
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+@pytest.mark.parametrize('quantile', [0, 1, 50, 90, 99, 99.9, 100])
+def test_percentiles_within_relative_error(latencies, quantile):
+    histogram = filled(latencies)
+    exact = exact_percentile(latencies, quantile)
+
+    assert histogram.percentile(quantile) == pytest.approx(exact, rel=histogram.relative_error)
+
+
+def test_summary_statistics_are_exact(latencies):
+    summary = filled(latencies).summary()
+
+    assert summary['count'] == len(latencies)
+    assert summary['meanMs'] == pytest.approx(statistics.fmean(latencies), rel=1e-12)
+    assert summary['stddevMs'] == pytest.approx(statistics.stdev(latencies), rel=1e-9)
+    assert summary['minMs'] == min(latencies)
+    assert summary['maxMs'] == max(latencies)
+
+
+def test_merge_matches_recording_everything_in_one(latencies):
+    first, second = latencies[:5000], latencies[5000:]
+    merged = filled(first).merge(filled(second))
+    whole = filled(latencies)
+
+    assert merged.buckets() == whole.buckets()
+    merged_summary, whole_summary = merged.summary(), whole.summary()
+    for key in ('count', 'minMs', 'maxMs', 'p50Ms', 'p90Ms', 'p99Ms', 'p999Ms'):
+        assert merged_summary[key] == whole_summary[key]
+    assert merged_summary['meanMs'] == pytest.approx(whole_summary['meanMs'], rel=1e-12)
+    assert merged_summary['stddevMs'] == pytest.approx(whole_summary['stddevMs'], rel=1e-9)
+
+
+def test_merge_into_and_from_empty_histograms():
+    histogram = filled([5.0, 10.0])
+
+    assert LatencyHistogram().merge(histogram).summary() == histogram.summary()
+    assert histogram.merge(LatencyHistogram()).summary()['count'] == 2
+
+
+def test_merge_rejects_different_relative_errors():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0.01).merge(LatencyHistogram(0.02))
+
+
+def test_copy_is_independent():
+    histogram = filled([1.0, 2.0])
+    copy = histogram.copy()
+    copy.record(3.0)
+
+    assert histogram.count == 2
+    assert copy.count == 3
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+
+    assert histogram.percentile(50) is None
+    assert histogram.summary() == {'count': 0}
+    assert histogram.buckets() == []
+
+
+def test_single_value_is_reported_exactly():
+    summary = filled([123.456]).summary()
+
+    assert summary['stddevMs'] == 0.0
+    assert all(summary[f'{name}Ms'] == 123.456 for name in ('p50', 'p90', 'p99', 'p999'))
+
+
+def test_buckets_cover_every_value(latencies):
+    histogram = filled(latencies)
+    buckets = histogram.buckets()
+
+    assert sum(bucket['count'] for bucket in buckets) == len(latencies)
+    assert all(bucket['lowerMs'] < bucket['upperMs'] for bucket in buckets)
+    assert all(earlier['upperMs'] <= later['lowerMs'] * (1 + 1e-12) for earlier, later in zip(buckets, buckets[1:]))
+    assert buckets[0]['lowerMs'] < min(latencies) <= buckets[0]['upperMs'] * (1 + 1e-12)
+    assert buckets[-1]['lowerMs'] < max(latencies) <= buckets[-1]['upperMs'] * (1 + 1e-12)
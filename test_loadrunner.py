@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+
+import pytest
+
+import loadrunner
+from loadrunner import LoadRun, run_moo_command
+from ppgen import write_pp_file
+
+FAKE_MOO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_moo.py')
+# A client that leaves a grandchild holding its stdout and stderr open after it exits
+ORPHANING_CLIENT = "import subprocess; print(subprocess.Popen(['sleep', '60']).pid, flush=True)"
+HAS_PROC_IO = os.path.exists('/proc/self/io')
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Run the load engine against `fake_moo.py` with an empty archive."""
+    store = tmp_path / 'store'
+    store.mkdir()
+    monkeypatch.setenv('FAKE_MOO_STORE', str(store))
+    monkeypatch.setattr(loadrunner, 'MOO_COMMAND', [sys.executable, FAKE_MOO])
+    return store
+
+
+def finish(run, timeout=60, start=True):
+    """Follow a run's events until `end`, returning its summary and events."""
+    if start:
+        run.start()
+    events = []
+    deadline = time.monotonic() + timeout
+    while not events or events[-1]['event'] != 'end':
+        assert time.monotonic() < deadline, 'load run did not finish'
+        new_events, _ = run.wait_for_events(events[-1]['id'] if events else 0, timeout=1)
+        events += new_events
+    return run.to_dict(since=0), events
+
+
+def alive(pid):
+    """Whether a process exists and is not a zombie waiting for its parent."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+
+def test_run_moo_command_success(store):
+    (store / 'a').mkdir()
+    (store / 'a' / 'field.pp').write_bytes(b'\0' * 1000)
+    chunks = []
+    result = run_moo_command(['ls', '-l', 'moose:/a'], on_output=lambda stream, text: chunks.append((stream, text)))
+
+    assert result['success'] is True
+    assert result['output'] == '          1000 moose:/a/field.pp\n'
+    assert ''.join(text for stream, text in chunks if stream == 'stdout') == result['output']
+    timing = result['timing']
+    assert 0 <= timing['spawnMs'] <= timing['firstByteMs'] <= timing['lastByteMs'] <= timing['exitMs']
+    assert timing['exitMs'] <= result['serverTiming']
+
+
+def test_run_moo_command_failure(store):
+    result = run_moo_command(['get', 'moose:/nothing.pp', str(store)])
+
+    assert result['success'] is False
+    assert result['message'] == 'Command failed'
+    assert 'does not exist' in result['error']
+
+
+def test_run_moo_command_missing_client(monkeypatch):
+    monkeypatch.setattr(loadrunner, 'MOO_COMMAND', ['/nonexistent/moo'])
+    result = run_moo_command(['si'])
+
+    assert result['success'] is False
+    assert 'serverTiming' not in result
+
+
+def test_reap_collects_rusage_of_the_child_alone(store):
+    resources = run_moo_command(['si'])['resources']
+
+    assert resources['userCpuMs'] + resources['systemCpuMs'] > 0
+    assert resources['maxRssKb'] > 0
+    if HAS_PROC_IO:
+        assert resources['readChars'] > 0
+        assert resources['writtenChars'] >= len('Version: moo fake-1.0')
+
+
+def test_reap_without_waitid(store, monkeypatch):
+    monkeypatch.delattr(loadrunner.os, 'waitid', raising=False)
+    result = run_moo_command(['si'])
+
+    assert result['success'] is True
+    assert result['timing']['exitMs'] is not None
+    assert result['resources']['maxRssKb'] > 0
+    assert 'readChars' not in result['resources']
+
+
+def test_timeout(store, monkeypatch):
+    monkeypatch.setenv('FAKE_MOO_LATENCY_MS', '30000')
+    started = time.monotonic()
+    result = run_moo_command(['si'], timeout=0.5)
+
+    assert time.monotonic() - started < 5
+    assert result == {'success': False, 'message': 'Command timed out after 0.5 seconds', 'error': 'Timeout'}
+
+
+def test_timeout_kills_grandchildren_holding_the_pipes(monkeypatch):
+    monkeypatch.setattr(loadrunner, 'MOO_COMMAND', [sys.executable, '-c', ORPHANING_CLIENT])
+    output = []
+    started = time.monotonic()
+    result = run_moo_command([], timeout=1, on_output=lambda stream, text: output.append(text))
+
+    assert time.monotonic() - started < 5
+    assert result['error'] == 'Timeout'
+    grandchild = int(''.join(output))
+    deadline = time.monotonic() + 5
+    while alive(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(grandchild)
+
+
+def test_iterations_and_statistics(store):
+    summary, events = finish(LoadRun(['si'], 6, concurrency=3))
+
+    assert summary['status'] == 'completed'
+    assert summary['completed'] == summary['succeeded'] == 6
+    assert sorted(result['iteration'] for result in summary['results']) == [1, 2, 3, 4, 5, 6]
+    assert summary['stats']['count'] == 6
+    assert [event['event'] for event in events].count('iteration') == 6
+    assert [event['id'] for event in events] == list(range(1, len(events) + 1))
+    assert events[-2]['data']['status'] == 'completed'
+
+
+def test_rate_limit_claims_evenly_spaced_slots():
+    run = LoadRun(['si'], 5, concurrency=5, rate=4)
+    claims = [run._claim_iteration() for _ in range(6)]
+
+    assert [claim[0] for claim in claims[:5]] == [0, 1, 2, 3, 4]
+    slots = [claim[1] for claim in claims[:5]]
+    assert [later - earlier for earlier, later in zip(slots, slots[1:])] == pytest.approx([0.25] * 4)
+    assert claims[5] is None
+
+
+def test_without_rate_limit_there_are_no_slots():
+    run = LoadRun(['si'], 2)
+
+    assert run._claim_iteration() == (0, None)
+
+
+def test_rate_limit_spaces_out_starts(store):
+    summary, _ = finish(LoadRun(['si'], 5, concurrency=5, rate=10))
+    starts = sorted(result['startedAt'] for result in summary['results'])
+
+    assert summary['succeeded'] == 5
+    assert all(later - earlier >= 0.08 for earlier, later in zip(starts, starts[1:]))
+
+
+def wait_for_first_iteration(run, timeout=30):
+    events = []
+    deadline = time.monotonic() + timeout
+    while 'iteration' not in [event['event'] for event in events]:
+        assert time.monotonic() < deadline, 'no iteration finished'
+        events += run.wait_for_events(events[-1]['id'] if events else 0, timeout=1)[0]
+
+
+def test_cancel_stops_claiming_iterations(store, monkeypatch):
+    monkeypatch.setenv('FAKE_MOO_LATENCY_MS', '200')
+    run = LoadRun(['si'], 50, concurrency=2)
+    run.start()
+    wait_for_first_iteration(run)
+    run.cancel()
+    summary, _ = finish(run, start=False)
+
+    assert summary['status'] == 'cancelled'
+    assert 1 <= summary['completed'] < 50
+
+
+def test_cancel_interrupts_rate_limit_wait(store):
+    run = LoadRun(['si'], 3, rate=0.1)
+    run.start()
+    wait_for_first_iteration(run)
+    started = time.monotonic()
+    run.cancel()
+    summary, _ = finish(run, start=False)
+
+    assert time.monotonic() - started < 5
+    assert summary['status'] == 'cancelled'
+    assert summary['completed'] == 1
+
+
+def test_wait_for_events_after_the_buffers_wrap(monkeypatch):
+    monkeypatch.setattr(loadrunner, 'MAX_BUFFERED_EVENTS', 10)
+    monkeypatch.setattr(loadrunner, 'MAX_BUFFERED_OUTPUT', 5)
+    run = LoadRun(['si'], 1)
+    for i in range(25):
+        run._publish('iteration', {'iteration': i + 1})
+    for i in range(12):
+        run._publish_output({'iteration': 1, 'stream': 'stdout', 'text': str(i)})
+
+    def ids(after, after_output):
+        events, outputs = run.wait_for_events(after, after_output, timeout=0)
+        return [event['id'] for event in events], [output['id'] for output in outputs]
+
+    assert ids(0, 0) == (list(range(16, 26)), list(range(8, 13)))
+    assert ids(20, 10) == ([21, 22, 23, 24, 25], [11, 12])
+    assert ids(25, 12) == ([], [])
+    assert ids(30, 20) == ([], [])
+    assert run.last_output_id == 12
+
+
+def test_chatty_output_does_not_push_out_iterations(store, monkeypatch):
+    monkeypatch.setattr(loadrunner, 'MAX_BUFFERED_OUTPUT', 3)
+    for i in range(20):
+        (store / f'file-{i:02d}').write_text('x')
+    run = LoadRun(['ls', 'moose:/'], 4, concurrency=2)
+    summary, events = finish(run)
+    _, outputs = run.wait_for_events(timeout=0)
+
+    assert [event['event'] for event in events].count('iteration') == 4
+    assert summary['succeeded'] == 4
+    assert [output['id'] for output in outputs] == list(range(run.last_output_id - 2, run.last_output_id + 1))
+
+
+def test_iteration_events_truncate_long_output(store, monkeypatch):
+    monkeypatch.setattr(loadrunner, 'MAX_EVENT_OUTPUT_CHARS', 100)
+    for i in range(50):
+        (store / f'file-{i:02d}').write_text('x')
+    summary, events = finish(LoadRun(['ls', 'moose:/'], 1))
+    output = next(event for event in events if event['event'] == 'iteration')['data']['output']
+
+    assert len(summary['results'][0]['output']) > 100
+    assert output.startswith(f"[{len(summary['results'][0]['output']) - 100} earlier characters omitted]\n")
+    assert output.endswith(summary['results'][0]['output'][-100:])
+
+
+def test_concurrent_gets_measure_their_own_download(store, tmp_path, monkeypatch):
+    # Staggered starts and slow copies: with a shared destination, downloads
+    # would be truncated by later ones before their size and checksum are taken
+    monkeypatch.setenv('FAKE_MOO_BANDWIDTH_MBPS', '40')
+    fixture = write_pp_file(str(store / 'field.pp'), 8 << 20, fields=8, seed=3)
+    dest = tmp_path / 'downloads'
+    dest.mkdir()
+
+    run = LoadRun(['get', 'moose:/field.pp', str(dest), '--force'], 16, concurrency=8, rate=20,
+                  verify_pp=True)
+    summary, _ = finish(run)
+
+    assert [result['bytes'] for result in summary['results']] == [fixture['sizeBytes']] * 16
+    assert all(result['ppVerification']['checksum']['combined'] == fixture['crc32'] for result in summary['results'])
+    assert summary['succeeded'] == 16
+    assert sorted(os.listdir(dest)) == [f'worker-{n}' for n in range(1, 9)]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'args': [], 'iterations': 1},
+    {'args': ['si'], 'iterations': 0},
+    {'args': ['si'], 'iterations': 1, 'concurrency': 0},
+    {'args': ['si'], 'iterations': 1, 'rate': 0},
+    {'args': ['si'], 'iterations': 1, 'delay_ms': -1},
+    {'args': ['si'], 'iterations': 1, 'sweep': {'transferThreads': [0]}}
+])
+def test_invalid_runs_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        LoadRun(**kwargs)
@@ -0,0 +1,204 @@
+import struct
+import zlib
+
+import pytest
+
+from ppfile import HEADER_BYTES, MARKER_BYTES, inspect_pp_file, read_headers, verify_download
+from ppgen import write_pp_file
+
+
+@pytest.fixture
+def uniform(tmp_path):
+    path = str(tmp_path / 'uniform.pp')
+    return path, write_pp_file(path, 64 << 10, fields=4, seed=1)
+
+
+@pytest.fixture
+def mixed(tmp_path):
+    """Unpacked fields followed by smaller packed ones, so the framing has to be walked."""
+    unpacked = write_pp_file(str(tmp_path / 'unpacked.pp'), 64 << 10, fields=4, seed=1)
+    packed = write_pp_file(str(tmp_path / 'packed.pp'), 24 << 10, fields=3, packed=True, seed=2)
+    path = tmp_path / 'mixed.pp'
+    path.write_bytes((tmp_path / 'unpacked.pp').read_bytes() + (tmp_path / 'packed.pp').read_bytes())
+    return str(path), unpacked, packed
+
+
+def payload_crcs(data):
+    """CRC-32 of every data payload, found by following the record markers independently."""
+    crcs, position = [], 0
+    while position < len(data):
+        data_position = position + HEADER_BYTES + 2 * MARKER_BYTES
+        length = struct.unpack_from('>i', data, data_position)[0]
+        crcs.append(f'{zlib.crc32(data[data_position + MARKER_BYTES:data_position + MARKER_BYTES + length]):08x}')
+        position = data_position + 2 * MARKER_BYTES + length
+    return crcs
+
+
+def test_uniform_file(uniform):
+    path, entry = uniform
+    info = inspect_pp_file(path)
+
+    assert info['valid'] is True
+    assert info['framing'] == 'uniform'
+    assert info['fieldCount'] == 4
+    assert info['errors'] == []
+    assert info['packing'] == {'unpacked': 4}
+    assert info['dataLengths'] == {'min': entry['fieldDataBytes'], 'max': entry['fieldDataBytes'],
+                                   'total': 4 * entry['fieldDataBytes']}
+    assert info['lblrecMismatches'] == 0
+    assert info['checksum'] == {'algorithm': 'crc32', 'combined': entry['crc32']}
+    with open(path, 'rb') as f:
+        assert [field['crc32'] for field in info['fields']] == payload_crcs(f.read())
+    assert [field['forecastPeriod'] for field in info['fields']] == [0, 1, 2, 3]
+    assert info['fields'][1]['validity'] == '2000-01-01T01:00'
+
+
+def test_mixed_shapes_are_walked(mixed):
+    path, unpacked, packed = mixed
+    info = inspect_pp_file(path)
+
+    assert info['valid'] is True
+    assert info['framing'] == 'walked'
+    assert info['fieldCount'] == 7
+    assert info['packing'] == {'unpacked': 4, 'WGDOS': 3}
+    assert info['dataLengths']['min'] == packed['fieldDataBytes']
+    assert info['dataLengths']['max'] == unpacked['fieldDataBytes']
+    with open(path, 'rb') as f:
+        crcs = payload_crcs(f.read())
+    assert [field['crc32'] for field in info['fields']] == crcs
+    assert info['fields'][4]['offset'] == unpacked['sizeBytes']
+
+
+def test_checksums_can_be_skipped(uniform):
+    info = inspect_pp_file(uniform[0], checksums=False)
+
+    assert info['valid'] is True
+    assert info['checksum'] is None
+    assert all(field['crc32'] is None for field in info['fields'])
+
+
+def test_truncated_tail(uniform, tmp_path):
+    path, entry = uniform
+    truncated = tmp_path / 'truncated.pp'
+    with open(path, 'rb') as f:
+        truncated.write_bytes(f.read()[:-100])
+    info = inspect_pp_file(str(truncated))
+
+    assert info['valid'] is False
+    assert info['framing'] == 'walked'
+    assert info['fieldCount'] == 3
+    assert 'runs past the end of the file' in info['errors'][0]['message']
+
+
+def test_trailing_bytes_shorter_than_a_field(uniform, tmp_path):
+    path, _ = uniform
+    padded = tmp_path / 'padded.pp'
+    with open(path, 'rb') as f:
+        padded.write_bytes(f.read() + b'\0' * 10)
+    info = inspect_pp_file(str(padded))
+
+    assert info['valid'] is False
+    assert info['fieldCount'] == 4
+    assert info['errors'][0]['message'] == '10 trailing bytes do not hold a complete field'
+
+
+def test_corrupted_trailing_marker(uniform, tmp_path):
+    path, entry = uniform
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    struct.pack_into('>i', data, len(data) - MARKER_BYTES, entry['fieldDataBytes'] + 1)
+    corrupted = tmp_path / 'corrupted.pp'
+    corrupted.write_bytes(data)
+    info = inspect_pp_file(str(corrupted))
+
+    assert info['valid'] is False
+    assert info['fieldCount'] == 3
+    assert info['errors'] == [{
+        'offset': len(data) - MARKER_BYTES,
+        'message': f"Data record markers are {entry['fieldDataBytes']}/{entry['fieldDataBytes'] + 1}"
+    }]
+
+
+def test_corrupted_header_marker(uniform, tmp_path):
+    path, _ = uniform
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    struct.pack_into('>i', data, 0, 255)
+    corrupted = tmp_path / 'corrupted.pp'
+    corrupted.write_bytes(data)
+    info = inspect_pp_file(str(corrupted))
+
+    assert info['valid'] is False
+    assert info['fieldCount'] == 0
+    assert info['errors'][0]['message'] == f'Header record markers are 255/{HEADER_BYTES}, expected {HEADER_BYTES}'
+
+
+def test_zero_length_file(tmp_path):
+    path = tmp_path / 'empty.pp'
+    path.write_bytes(b'')
+    info = inspect_pp_file(str(path))
+
+    assert info['valid'] is False
+    assert info['sizeBytes'] == 0
+    assert info['errors'] == [{'offset': 0, 'message': 'File is empty'}]
+    with pytest.raises(ValueError):
+        read_headers(str(path))
+
+
+def test_file_too_small_for_a_field(tmp_path):
+    path = tmp_path / 'small.pp'
+    path.write_bytes(b'\0' * 100)
+    info = inspect_pp_file(str(path))
+
+    assert info['valid'] is False
+    assert info['framing'] is None
+    assert info['errors'][0]['message'] == '100 bytes do not hold a complete field'
+
+
+def test_read_headers(mixed):
+    path, _, _ = mixed
+    headers = read_headers(path)
+
+    assert len(headers) == 7
+    assert list(headers['lbpack']) == [0, 0, 0, 0, 1, 1, 1]
+
+
+def test_verify_download_passes_a_valid_file(uniform):
+    path, entry = uniform
+    result = verify_download({'success': True, 'message': 'ok'}, ['get', 'moose:/a/uniform.pp', path])
+
+    assert result['success'] is True
+    assert result['ppVerification']['valid'] is True
+    assert result['ppVerification']['fieldCount'] == 4
+    assert result['ppVerification']['checksum']['combined'] == entry['crc32']
+
+
+def test_verify_download_fails_a_malformed_file(uniform, tmp_path):
+    path, _ = uniform
+    with open(path, 'rb') as f:
+        data = f.read()
+    download = tmp_path / 'download.pp'
+    download.write_bytes(data[:-100])
+    result = verify_download({'success': True, 'message': 'ok'}, ['get', 'moose:/a/download.pp', str(download)])
+
+    assert result['success'] is False
+    assert result['ppVerification']['valid'] is False
+    assert result['message'].startswith('Downloaded PP file failed verification: Data record length')
+
+
+def test_verify_download_reports_a_missing_file(tmp_path):
+    result = verify_download({'success': True, 'message': 'ok'}, ['get', 'moose:/a/gone.pp', str(tmp_path / 'gone.pp')])
+
+    assert result['success'] is False
+    assert result['ppVerification']['fieldCount'] == 0
+
+
+def test_verify_download_skips_failed_and_non_pp_results(uniform, tmp_path):
+    path, _ = uniform
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('not a PP file')
+    failed = {'success': False, 'message': 'error'}
+
+    assert 'ppVerification' not in verify_download(failed, ['get', 'moose:/a/uniform.pp', path])
+    assert 'ppVerification' not in verify_download({'success': True}, ['get', 'moose:/a/notes.txt', str(notes)])
+    assert 'ppVerification' not in verify_download({'success': True}, ['put', path, 'moose:/a'])
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from ppfile import inspect_pp_file
+from ppgen import MANIFEST_NAME, build_ladder, load_manifest, parse_size, write_pp_file
+
+LADDER = ('16KiB', '64KiB')
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_same_seed_writes_identical_files(tmp_path, packed):
+    first = write_pp_file(str(tmp_path / 'first.pp'), 96 << 10, fields=3, packed=packed, seed=5)
+    second = write_pp_file(str(tmp_path / 'second.pp'), 96 << 10, fields=3, packed=packed, seed=5)
+    other = write_pp_file(str(tmp_path / 'other.pp'), 96 << 10, fields=3, packed=packed, seed=6)
+
+    assert read(first['path']) == read(second['path'])
+    assert first['crc32'] == second['crc32']
+    assert read(first['path']) != read(other['path'])
+
+
+@pytest.mark.parametrize('packed, packing', [(False, 'unpacked'), (True, 'WGDOS')])
+def test_crc32_matches_inspection(tmp_path, packed, packing):
+    entry = write_pp_file(str(tmp_path / 'field.pp'), 256 << 10, fields=4, packed=packed, seed=1)
+    info = inspect_pp_file(entry['path'])
+
+    assert info['valid'] is True
+    assert info['fieldCount'] == 4
+    assert info['packing'] == {packing: 4}
+    assert info['sizeBytes'] == entry['sizeBytes'] <= entry['targetBytes']
+    assert info['checksum']['combined'] == entry['crc32']
+    assert info['lblrecMismatches'] == 0
+
+
+def test_size_too_small(tmp_path):
+    with pytest.raises(ValueError, match='too small'):
+        write_pp_file(str(tmp_path / 'small.pp'), 1000, fields=4)
+
+
+def test_fields_too_large(tmp_path):
+    with pytest.raises(ValueError, match='cannot exceed'):
+        write_pp_file(str(tmp_path / 'large.pp'), 4 << 30, fields=1)
+
+
+def test_packed_rows_too_many(tmp_path):
+    # 16-bit row count: 1 GiB of two-column rows needs far more than 65535 of them
+    with pytest.raises(ValueError, match='rows'):
+        write_pp_file(str(tmp_path / 'rows.pp'), 1 << 30, fields=1, packed=True)
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    with pytest.raises(ValueError):
+        write_pp_file(str(tmp_path / 'small.pp'), 1000, fields=4)
+
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('text, size', [('1048576', 1 << 20), ('512KiB', 512 << 10), ('10GiB', 10 << 30),
+                                        ('1.5M', 3 << 19), ('64 MiB', 64 << 20)])
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+
+def test_parse_size_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_size('ten megabytes')
+
+
+def test_ladder_writes_manifest(tmp_path):
+    manifest = build_ladder(str(tmp_path), sizes=LADDER, moose_prefix='moose:/adhoc/perf/')
+
+    assert load_manifest(str(tmp_path / MANIFEST_NAME)) == manifest
+    assert [entry['targetBytes'] for entry in manifest['files']] == [16 << 10, 64 << 10]
+    for entry in manifest['files']:
+        assert entry['mooseUri'] == f"moose:/adhoc/perf/{entry['name']}"
+        assert inspect_pp_file(entry['path'])['checksum']['combined'] == entry['crc32']
+
+
+def test_ladder_reuses_unchanged_files(tmp_path):
+    build_ladder(str(tmp_path), sizes=LADDER)
+    mtimes = {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path) if name.endswith('.pp')}
+    reused = []
+    build_ladder(str(tmp_path), sizes=LADDER, on_file=lambda entry, was_reused: reused.append(was_reused))
+
+    assert reused == [True, True]
+    assert {name: os.stat(tmp_path / name).st_mtime_ns for name in mtimes} == mtimes
+
+
+def test_ladder_regenerates_when_the_seed_changes(tmp_path):
+    first = build_ladder(str(tmp_path), sizes=LADDER, seed=0)
+    reused = []
+    second = build_ladder(str(tmp_path), sizes=LADDER, seed=1, on_file=lambda entry, was_reused: reused.append(was_reused))
+
+    assert reused == [False, False]
+    assert [entry['seed'] for entry in second['files']] == [1, 1]
+    assert all(before['crc32'] != after['crc32'] for before, after in zip(first['files'], second['files']))
+    assert all(inspect_pp_file(entry['path'])['checksum']['combined'] == entry['crc32'] for entry in second['files'])
+
+
+def test_ladder_regenerates_a_file_of_the_wrong_size(tmp_path):
+    manifest = build_ladder(str(tmp_path), sizes=LADDER)
+    damaged = manifest['files'][0]['path']
+    with open(damaged, 'ab') as f:
+        f.write(b'\0')
+    reused = []
+    build_ladder(str(tmp_path), sizes=LADDER, on_file=lambda entry, was_reused: reused.append(was_reused))
+
+    assert reused == [False, True]
+    assert inspect_pp_file(damaged)['valid'] is True
@@ -0,0 +1,138 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from resultstore import ResultStore, student_t_sf, welch_test
+
+# Upper-tail probabilities from a standard t-table (critical values rounded to 3 decimals)
+T_TABLE = [
+    (1.812, 10, 0.05),
+    (2.228, 10, 0.025),
+    (2.764, 10, 0.01),
+    (2.086, 20, 0.025),
+    (2.845, 20, 0.005),
+    (1.697, 30, 0.05),
+    (12.706, 1, 0.025),
+    (1.960, 1e6, 0.025),
+]
+
+
+def aggregate(mean, variance, samples):
+    return {'meanMs': mean, 'varianceMs': variance, 'samples': samples}
+
+
+@pytest.mark.parametrize('t, df, expected', T_TABLE)
+def test_student_t_sf_matches_t_table(t, df, expected):
+    assert student_t_sf(t, df) == pytest.approx(expected, abs=2e-4)
+
+
+@pytest.mark.parametrize('t, df, expected', T_TABLE)
+def test_student_t_sf_is_symmetric(t, df, expected):
+    assert student_t_sf(-t, df) == pytest.approx(1 - expected, abs=2e-4)
+
+
+def test_student_t_sf_at_zero_is_one_half():
+    assert student_t_sf(0.0, 7) == pytest.approx(0.5)
+
+
+def test_welch_test_flags_significant_slowdown():
+    result = welch_test(aggregate(100.0, 100.0, 10), aggregate(110.0, 100.0, 10))
+
+    assert result['differenceMs'] == pytest.approx(10.0)
+    assert result['changePercent'] == pytest.approx(10.0)
+    assert result['tStatistic'] == pytest.approx(10 / math.sqrt(20))
+    assert result['degreesOfFreedom'] == pytest.approx(18.0)
+    # t = 2.236 with 18 degrees of freedom lies between the 2.5% and 1% critical values
+    assert 0.01 < result['pValue'] < 0.025
+    assert result['regression'] is True
+
+
+def test_welch_test_ignores_speedup():
+    result = welch_test(aggregate(110.0, 100.0, 10), aggregate(100.0, 100.0, 10))
+
+    assert result['pValue'] > 0.95
+    assert result['regression'] is False
+
+
+@pytest.mark.parametrize('baseline_samples, candidate_samples', [(1, 10), (10, 1), (0, 0)])
+def test_welch_test_needs_two_samples_per_side(baseline_samples, candidate_samples):
+    assert welch_test(aggregate(100.0, 1.0, baseline_samples), aggregate(110.0, 1.0, candidate_samples)) is None
+
+
+def test_welch_test_zero_variance_slowdown_is_certain():
+    result = welch_test(aggregate(100.0, 0.0, 5), aggregate(101.0, 0.0, 5))
+
+    assert result['tStatistic'] is None
+    assert result['degreesOfFreedom'] == 8
+    assert result['pValue'] == 0.0
+    assert result['regression'] is True
+
+
+def test_welch_test_zero_variance_without_slowdown():
+    result = welch_test(aggregate(100.0, 0.0, 5), aggregate(100.0, 0.0, 5))
+
+    assert result['pValue'] == 1.0
+    assert result['regression'] is False
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / 'results.db'))
+
+
+def stored_run(store, run_id, response_times):
+    run = SimpleNamespace(id=run_id, args=['get', 'moose:/a/field.pp', '.'], client_version='moo 1.0',
+                          total_iterations=len(response_times), concurrency=1, rate=None, created_at=1000.0)
+    store.record_run(run)
+    for i, response_ms in enumerate(response_times):
+        store.record_iteration(run, {
+            'iteration': i + 1,
+            'startedAt': 1000.0 + i,
+            'success': True,
+            'message': 'Command executed successfully',
+            'serverTiming': response_ms,
+            'timing': {'spawnMs': 1.0, 'firstByteMs': 2.0, 'lastByteMs': 3.0, 'exitMs': 4.0},
+            'resources': {'userCpuMs': 5.0, 'systemCpuMs': 6.0, 'maxRssKb': 7},
+            'bytes': 8000000,
+            'throughputMBps': 8.0,
+            'params': {'transferThreads': 2}
+        })
+    store.flush()
+
+
+def test_history_uses_camel_case_keys(store):
+    stored_run(store, 'run-1', [100.0, 110.0])
+    iterations = store.history(run_id='run-1')
+
+    assert [iteration['iteration'] for iteration in iterations] == [2, 1]
+    assert iterations[0] == {
+        'id': iterations[0]['id'],
+        'runId': 'run-1',
+        'iteration': 2,
+        'command': 'get',
+        'clientVersion': 'moo 1.0',
+        'startedAt': 1001.0,
+        'success': True,
+        'responseMs': 110.0,
+        'spawnMs': 1.0,
+        'firstByteMs': 2.0,
+        'lastByteMs': 3.0,
+        'exitMs': 4.0,
+        'userCpuMs': 5.0,
+        'systemCpuMs': 6.0,
+        'maxRssKb': 7,
+        'bytes': 8000000,
+        'throughputMBps': 8.0,
+        'transferThreads': 2,
+        'message': 'Command executed successfully'
+    }
+
+
+def test_history_and_runs_limits(store):
+    stored_run(store, 'run-1', [100.0, 110.0, 120.0])
+
+    assert len(store.history(limit=0)) == 1
+    assert len(store.history(limit=2)) == 2
+    assert store.runs(limit=-1)[0]['runId'] == 'run-1'
+    assert store.runs()[0]['stats']['iterations'] == 3
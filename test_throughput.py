@@ -0,0 +1,32 @@
+import pytest
+
+from throughput import add_throughput
+
+
+@pytest.fixture
+def downloaded(tmp_path):
+    path = tmp_path / 'field.pp'
+    path.write_bytes(b'\0' * 2_000_000)
+    return path
+
+
+def test_add_throughput_measures_a_full_transfer(downloaded):
+    result = add_throughput({'success': True, 'serverTiming': 1000}, ['get', 'moose:/a/field.pp', str(downloaded)])
+
+    assert result['bytes'] == 2_000_000
+    assert result['throughputMBps'] == pytest.approx(2.0)
+    assert 'throughputNote' not in result
+
+
+@pytest.mark.parametrize('flag', [
+    '--dry-run',
+    '--fill-gaps',
+    '--fill-gaps-and-overwrite-smaller-files',
+    '--force-excluding-identical'
+])
+def test_add_throughput_skips_partial_transfers(downloaded, flag):
+    result = add_throughput({'success': True, 'serverTiming': 1000}, ['get', 'moose:/a/field.pp', str(downloaded), flag])
+
+    assert result['bytes'] is None
+    assert result['throughputMBps'] is None
+    assert flag in result['throughputNote']
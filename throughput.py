@@ -0,0 +1,161 @@
+import os
+import posixpath
+
+TRANSFER_THREADS_FLAG = '--transfer-threads'
+# Flags under which the local file's size is not what the command transferred:
+# a dry run moves nothing and the others skip files or parts already in place
+UNMEASURED_TRANSFER_FLAGS = (
+    '--dry-run',
+    '--fill-gaps',
+    '--fill-gaps-and-overwrite-smaller-files',
+    '--force-excluding-identical'
+)
+
+
+def transferred_path(args):
+    """Return the local file a `moo get`/`moo put` reads or writes, if known."""
+    if len(args) < 3:
+        return None
+    if args[0] == 'put':
+        return args[1]
+    if args[0] == 'get':
+        uri, dest = args[1], args[2]
+        if os.path.isdir(dest):
+            return os.path.join(dest, posixpath.basename(uri))
+        return dest
+    return None
+
+
+def with_worker_destination(args, worker):
+    """Return (args, directory) for a `moo get` downloading into its own `worker-<n>` directory.
+
+    Concurrent iterations sharing one destination overwrite each other's file,
+    so sizes and checksums would come from a half-written download. A
+    directory destination gets a `worker-<n>` subdirectory; a file destination
+    keeps its name inside one next to it. Returns None for other commands.
+    """
+    if len(args) < 3 or args[0] != 'get':
+        return None
+    dest = args[2]
+    name = f'worker-{worker + 1}'
+    if dest.endswith(('/', os.sep)) or os.path.isdir(dest):
+        directory = os.path.join(dest, name)
+        worker_dest = directory
+    else:
+        directory = os.path.join(os.path.dirname(dest), name)
+        worker_dest = os.path.join(directory, os.path.basename(dest))
+    return args[:2] + [worker_dest] + args[3:], directory
+
+
+def transferred_bytes(args):
+    path = transferred_path(args)
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def unmeasured_transfer_flag(args):
+    """Return the first flag in `args` that makes the file size unreliable, if any."""
+    return next((arg for arg in args if arg in UNMEASURED_TRANSFER_FLAGS), None)
+
+
+def add_throughput(result, args):
+    """Stat the transferred file and add `bytes` and `throughputMBps` to a result.
+
+    Both stay None when the command may not have transferred the whole file,
+    with `throughputNote` saying why.
+    """
+    flag = unmeasured_transfer_flag(args)
+    if flag is not None:
+        result['bytes'] = None
+        result['throughputMBps'] = None
+        result['throughputNote'] = f'Throughput not measured: {flag} may skip part or all of the transfer'
+        return result
+    size = transferred_bytes(args) if result.get('success') else None
+    result['bytes'] = size
+    seconds = (result.get('serverTiming') or 0) / 1000
+    result['throughputMBps'] = size / 1e6 / seconds if size is not None and seconds > 0 else None
+    return result
+
+
+def with_transfer_threads(args, threads):
+    """Return a copy of `args` with `--transfer-threads` set to `threads`."""
+    args = [arg for arg in args if not arg.startswith(TRANSFER_THREADS_FLAG + '=')]
+    return args + [f'{TRANSFER_THREADS_FLAG}={threads}']
+
+
+def expand_sweep(args, sources=None, transfer_threads=None):
+    """Expand a command into one case per source file and transfer thread count.
+
+    `sources` replace the first positional argument (the MOOSE URI for `get`,
+    the local file for `put`). Each case is a dict holding the `args` to run
+    and the swept `params`.
+    """
+    cases = []
+    for source in sources or [None]:
+        for threads in transfer_threads or [None]:
+            case_args = list(args)
+            if source is not None:
+                case_args[1] = source
+            if threads is not None:
+                case_args = with_transfer_threads(case_args, threads)
+            cases.append({
+                'args': case_args,
+                'params': {'source': source, 'transferThreads': threads}
+            })
+    return cases
+
+
+class ThroughputCurves:
+    """Running throughput-vs-size and throughput-vs-threads curves.
+
+    Results are folded into per-point counters as they arrive, so the curves
+    cost the same however many iterations a run has.
+    """
+
+    def __init__(self):
+        self._by_size = {}
+        self._by_threads = {}
+
+    @staticmethod
+    def _add(groups, x, value):
+        point = groups.get(x)
+        if point is None:
+            groups[x] = [1, value, value, value]
+        else:
+            point[0] += 1
+            point[1] += value
+            point[2] = min(point[2], value)
+            point[3] = max(point[3], value)
+
+    def add(self, result):
+        value = result.get('throughputMBps')
+        if value is None:
+            return
+        if result.get('bytes') is not None:
+            self._add(self._by_size, result['bytes'], value)
+        threads = (result.get('params') or {}).get('transferThreads')
+        if threads is not None:
+            self._add(self._by_threads, threads, value)
+
+    @staticmethod
+    def _curve(groups, name):
+        return [
+            {
+                name: x,
+                'iterations': count,
+                'meanMBps': total / count,
+                'minMBps': low,
+                'maxMBps': high
+            }
+            for x, (count, total, low, high) in sorted(groups.items())
+        ]
+
+    def to_dict(self):
+        return {
+            'bySize': self._curve(self._by_size, 'sizeBytes'),
+            'byThreads': self._curve(self._by_threads, 'transferThreads')
+        }